@@ -0,0 +1,65 @@
+"""Wall time of printing a batch of checks depending on the number of wkhtmltopdf workers.
+
+Runs on an existing database with posted check payments, in a transaction that is rolled back:
+
+    python benchmarks/bench_check_print.py -c odoo.conf -d mydb --payments 300 --workers 1,2,4,8
+"""
+import argparse
+import json
+import time
+
+import odoo
+from odoo.tools import config
+
+
+def bench_check_print(env, payment_count, workers_list, chunk_size):
+    payments = env['account.payment'].search([
+        ('payment_method_id.code', '=', 'check_printing'),
+        ('state', '=', 'posted'),
+    ], limit=payment_count)
+    if not payments:
+        raise SystemExit('No posted check payment to print.')
+    report = env.ref(payments[0].company_id.account_check_printing_layout)
+    # measure the rendering: no saved attachment, no cached pdf
+    report.attachment = False
+    ICP = env['ir.config_parameter']
+    ICP.set_param('ecodrip_account.check_print_chunk_size', chunk_size)
+
+    results = []
+    for workers in workers_list:
+        ICP.set_param('ecodrip_account.check_print_workers', workers)
+        env['ecodrip.check.pdf.cache'].search([]).unlink()
+        start = time.time()
+        report._render_qweb_pdf(res_ids=payments.ids)
+        results.append({'workers': workers, 'payments': len(payments), 'wall_time': time.time() - start})
+    for result in results:
+        result['speedup'] = results[0]['wall_time'] / result['wall_time']
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-c', '--config', required=True)
+    parser.add_argument('-d', '--database', required=True)
+    parser.add_argument('--payments', type=int, default=300)
+    parser.add_argument('--workers', default='1,2,4,8', help='comma separated worker counts')
+    parser.add_argument('--chunk-size', type=int, default=25)
+    parser.add_argument('--output', help='write the results in this json file')
+    args = parser.parse_args()
+
+    config.parse_config(['-c', args.config, '-d', args.database])
+    registry = odoo.registry(args.database)
+    with odoo.api.Environment.manage(), registry.cursor() as cr:
+        env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
+        results = bench_check_print(env, args.payments, [int(w) for w in args.workers.split(',')], args.chunk_size)
+        cr.rollback()
+
+    for result in results:
+        print('%(workers)3d workers  %(payments)5d checks  %(wall_time)8.2fs  x%(speedup).2f' % result)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""Synthetic data generators and measuring helpers shared by the benchmarks."""
+import base64
+import io
+import threading
+import time
+from contextlib import contextmanager
+
+from dateutil.relativedelta import relativedelta
+from PIL import Image
+
+from odoo import fields
+
+
+@contextmanager
+def measure(env, result):
+    """ Fill ``result`` with the wall time, the number and the time of the sql queries of the block, pending writes
+        included. The queries are counted on the thread: those of the other cursors it opens (logs, counters) as well.
+    """
+    thread = threading.current_thread()
+    if not hasattr(thread, 'query_count'):
+        # set by the http and cron threads, incremented by every cursor of the thread
+        thread.query_count = 0
+        thread.query_time = 0
+    env['base'].flush()
+    queries, query_time = thread.query_count, thread.query_time
+    start = time.time()
+    yield result
+    env['base'].flush()
+    result['wall_time'] = time.time() - start
+    result['queries'] = thread.query_count - queries
+    result['query_time'] = thread.query_time - query_time
+
+
+@contextmanager
+def rollback(env, name='benchmark'):
+    """ Undo everything done in the block, so that each benchmark and each scale starts from the same data. """
+    env['base'].flush()
+    env.cr.execute('SAVEPOINT "%s"' % name)
+    try:
+        yield
+    finally:
+        env.cr.execute('ROLLBACK TO SAVEPOINT "%s"' % name)
+        env.clear()
+
+
+def today(env):
+    return fields.Date.context_today(env.user)
+
+
+def create_companies(env, count):
+    """ ``count`` companies with a chart of accounts and the APR settings, the current company first. """
+    companies = env.company
+    chart_template = env.ref('l10n_generic_coa.configurable_chart_template')
+    for i in range(count - 1):
+        company = env['res.company'].create({'name': 'Benchmark Company %s' % i, 'currency_id': env.company.currency_id.id})
+        env.user.company_ids |= company
+        chart_template.try_loading(company=company)
+        companies |= company
+    revenue = env.ref('account.data_account_type_revenue')
+    for company in companies:
+        company.write({
+            'x_apr_product_id': env.ref('ecodrip_sale_account.x_product_apr_ecodrip').id,
+            'x_apr_payment_term_id': env.ref('ecodrip_sale_account.x_account_payment_term_apr_ecodrip').id,
+            'x_apr_account_id': env['account.account'].search([('company_id', '=', company.id), ('user_type_id', '=', revenue.id)], limit=1).id,
+        })
+    return companies
+
+
+def create_partners(env, count, name='Benchmark Customer'):
+    return env['res.partner'].create([{'name': '%s %s' % (name, i)} for i in range(count)])
+
+
+def create_overdue_invoices(env, companies, customer_count, invoice_count, months_overdue):
+    """ ``invoice_count`` posted customer invoices spread over the companies and ``customer_count`` customers,
+        due ``months_overdue`` months ago and not paid.
+    """
+    customers = create_partners(env, customer_count)
+    date = today(env) - relativedelta(months=months_overdue)
+    invoices = env['account.move']
+    for index, company in enumerate(companies):
+        journal = env['account.journal'].search([('type', '=', 'sale'), ('company_id', '=', company.id)], limit=1)
+        invoices |= env['account.move'].with_company(company).create([{
+            'move_type': 'out_invoice',
+            'journal_id': journal.id,
+            'partner_id': customers[i % len(customers)].id,
+            'invoice_date': date,
+            'invoice_line_ids': [(0, 0, {'name': 'Benchmark', 'quantity': 1, 'price_unit': 1000.0 + i})],
+        } for i in range(index, invoice_count, len(companies))])
+    invoices.action_post()
+    return invoices
+
+
+def create_check_payments(env, company, payment_count, bills_per_payment):
+    """ ``payment_count`` check payments, each one paying ``bills_per_payment`` bills of its own vendor, half of the
+        bills taking an early payment discount.
+    """
+    date = today(env)
+    vendors = create_partners(env, payment_count, name='Benchmark Vendor')
+    purchase_journal = env['account.journal'].search([('type', '=', 'purchase'), ('company_id', '=', company.id)], limit=1)
+    bank_journal = env['account.journal'].search([('type', '=', 'bank'), ('company_id', '=', company.id)], limit=1)
+    check_method = env.ref('account_check_printing.account_payment_method_check')
+    bank_journal.outbound_payment_method_ids |= check_method
+
+    bills = env['account.move'].with_company(company).create([{
+        'move_type': 'in_invoice',
+        'journal_id': purchase_journal.id,
+        'partner_id': vendor.id,
+        'invoice_date': date,
+        'ref': 'BILL-%s-%s' % (vendor.id, i),
+        'early_payment_discount': 5.0 if i % 2 else 0.0,
+        'early_payment_deadline': date + relativedelta(days=10),
+        'invoice_line_ids': [(0, 0, {'name': 'Benchmark', 'quantity': 1, 'price_unit': 100.0 + i})],
+    } for vendor in vendors for i in range(bills_per_payment)])
+    bills.action_post()
+
+    payments = env['account.payment']
+    for vendor in vendors:
+        vendor_bills = bills.filtered(lambda bill: bill.partner_id == vendor)
+        payments |= env['account.payment.register'].with_context(active_model='account.move', active_ids=vendor_bills.ids).create({
+            'payment_date': date,
+            'journal_id': bank_journal.id,
+            'payment_method_id': check_method.id,
+            'group_payment': True,
+        })._create_payments()
+    return payments
+
+
+def create_signature_image(width=2400, height=800):
+    """ A big signature, as scanned by the users. """
+    image = Image.new('RGB', (width, height), 'white')
+    for x in range(0, width, 7):
+        image.putpixel((x, (x * 13) % height), (0, 0, 80))
+    stream = io.BytesIO()
+    image.save(stream, format='PNG')
+    return base64.b64encode(stream.getvalue())
+
+
+def create_sale_orders(env, order_count, line_count):
+    """ ``order_count`` draft orders of ``line_count`` lines, all sold above cost. """
+    products = env['product.product'].create([{
+        'name': 'Benchmark Product %s' % i,
+        'type': 'consu',
+        'standard_price': 50.0,
+        'list_price': 100.0,
+    } for i in range(line_count)])
+    customers = create_partners(env, order_count)
+    return env['sale.order'].create([{
+        'partner_id': customer.id,
+        'order_line': [(0, 0, {'product_id': product.id, 'product_uom_qty': 1, 'price_unit': 100.0}) for product in products],
+    } for customer in customers])
+
+
+def create_salesman(env):
+    """ A salesman who is not a sales manager, so that the margins are checked. """
+    return env['res.users'].create({
+        'name': 'Benchmark Salesman',
+        'login': 'benchmark_salesman',
+        'company_ids': [(6, 0, env.companies.ids)],
+        'groups_id': [(6, 0, [env.ref('sales_team.group_sale_salesman_all_leads').id, env.ref('base.group_user').id])],
+    })
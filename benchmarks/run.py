@@ -0,0 +1,234 @@
+"""Wall time and sql queries of the hot paths of the ecodrip modules, on generated data.
+
+Each benchmark runs twice, on ``--size`` then on twice as many records, in a transaction that is rolled back. The
+difference of queries between both runs, divided by the difference of records, is the number of queries per record.
+The records are the aprs created for the apr benchmarks, the payments for the check benchmarks and the order lines
+for the sale order benchmarks. Over budget, the run fails:
+
+    python benchmarks/run.py -c odoo.conf -d mydb --output results.json
+
+benchmarks/budgets.json gives each benchmark a fixed ``max_queries_per_record``, or a ``tolerance`` over the queries
+per record of a baseline, benchmarks/baseline.json, to hold a path to what it costs on a given database. The baseline
+is recorded with:
+
+    python benchmarks/run.py -c odoo.conf -d mydb --write-baseline
+
+Runs are only compared to a baseline recorded with the same --size, --companies, --customers, --months and
+--bills-per-payment.
+
+The database needs ecodrip_account, ecodrip_sale_account and l10n_generic_coa installed. Check printing needs
+wkhtmltopdf, use ``--skip-pdf`` without it.
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+
+import odoo
+from odoo.tools import config
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks import common  # noqa: E402
+
+
+def bench_generate_apr(env, size, options):
+    invoices = common.create_overdue_invoices(env, options.companies, options.customers, size, options.months)
+    with common.measure(env, {'invoices': len(invoices)}) as result:
+        aprs = invoices.generate_apr()
+    # per apr, an invoice has one per month overdue
+    result['records'] = len(aprs)
+    return result
+
+
+def bench_action_generate_apr(env, size, options):
+    invoices = common.create_overdue_invoices(env, options.companies, options.customers, size, options.months)
+    # the backlog may hold other invoices of the database, the batch has as many invoices anyway
+    apr_count = env['account.move'].search_count([('x_invoice_id', '!=', False)])
+    with common.measure(env, {'invoices': len(invoices)}) as result:
+        env['account.move'].action_generate_apr(batch_size=len(invoices))
+    result['records'] = env['account.move'].search_count([('x_invoice_id', '!=', False)]) - apr_count
+    return result
+
+
+def bench_check_stub_pages(env, size, options):
+    payments = common.create_check_payments(env, options.companies[0], size, options.bills_per_payment)
+    env.clear()
+    payments = payments.browse(payments.ids)
+    with common.measure(env, {'records': len(payments)}) as result:
+        for payment in payments:
+            payment._check_make_stub_pages()
+    return result
+
+
+def bench_check_pdf(env, size, options):
+    company = options.companies[0]
+    payments = common.create_check_payments(env, company, size, options.bills_per_payment)
+    report = env.ref(company.account_check_printing_layout)
+    # measure the rendering: no saved attachment, no cached pdf
+    report.attachment = False
+    env['ecodrip.check.pdf.cache'].search([]).unlink()
+    with common.measure(env, {'records': len(payments)}) as result:
+        report._render_qweb_pdf(res_ids=payments.ids)
+    return result
+
+
+def bench_signature_write(env, size, options):
+    company = options.companies[0]
+    payments = common.create_check_payments(env, company, size, options.bills_per_payment)
+    image = common.create_signature_image()
+    with common.measure(env, {'records': len(payments)}) as result:
+        company.write({'account_check_signature_image': image})
+    return result
+
+
+def bench_sale_order_confirm(env, size, options):
+    order = common.create_sale_orders(env, 1, size)
+    salesman = common.create_salesman(env)
+    with common.measure(env, {'records': len(order.order_line)}) as result:
+        order.with_user(salesman).action_confirm()
+    return result
+
+
+def bench_sale_order_margin_check(env, size, options):
+    order = common.create_sale_orders(env, 1, size)
+    salesman = common.create_salesman(env)
+    with common.measure(env, {'records': len(order.order_line)}) as result:
+        order.with_user(salesman)._get_below_cost_lines()
+    return result
+
+
+BENCHMARKS = {
+    'generate_apr': bench_generate_apr,
+    'action_generate_apr': bench_action_generate_apr,
+    'check_stub_pages': bench_check_stub_pages,
+    'check_pdf': bench_check_pdf,
+    'signature_write': bench_signature_write,
+    'sale_order_confirm': bench_sale_order_confirm,
+    'sale_order_margin_check': bench_sale_order_margin_check,
+}
+PDF_BENCHMARKS = {'check_pdf'}
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def get_max_queries_per_record(name, budget, baseline):
+    if 'max_queries_per_record' in budget:
+        return budget['max_queries_per_record']
+    if name not in baseline:
+        return None
+    return baseline[name]['queries_per_record'] + budget.get('tolerance', 0)
+
+
+def run_benchmark(env, name, options, budget, baseline):
+    runs = []
+    for size in (options.size, options.size * 2):
+        with common.rollback(env, name):
+            runs.append(BENCHMARKS[name](env, size, options))
+    records = runs[1]['records'] - runs[0]['records']
+    queries_per_record = (runs[1]['queries'] - runs[0]['queries']) / records if records else 0.0
+
+    errors = []
+    max_queries_per_record = get_max_queries_per_record(name, budget, baseline)
+    if max_queries_per_record is not None and queries_per_record > max_queries_per_record:
+        errors.append('%.2f queries per record, the budget is %.2f' % (queries_per_record, max_queries_per_record))
+    return {
+        'runs': runs,
+        'queries_per_record': queries_per_record,
+        'max_queries_per_record': max_queries_per_record,
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-c', '--config', required=True)
+    parser.add_argument('-d', '--database', required=True)
+    parser.add_argument('--size', type=int, default=50, help='records of the first run, the second run has twice as many')
+    parser.add_argument('--companies', type=int, default=1)
+    parser.add_argument('--customers', type=int, default=10)
+    parser.add_argument('--months', type=int, default=3, help='months the invoices are overdue')
+    parser.add_argument('--bills-per-payment', type=int, default=20)
+    parser.add_argument('--benchmarks', default=','.join(BENCHMARKS), help='comma separated benchmarks to run')
+    parser.add_argument('--skip-pdf', action='store_true', help='skip the benchmarks that need wkhtmltopdf')
+    parser.add_argument('--budgets', default=os.path.join(BENCHMARKS_DIR, 'budgets.json'))
+    parser.add_argument('--baseline', default=os.path.join(BENCHMARKS_DIR, 'baseline.json'))
+    parser.add_argument('--write-baseline', action='store_true', help='record the results as the new baseline')
+    parser.add_argument('--output', help='write the results in this json file')
+    args = parser.parse_args()
+
+    names = [name for name in args.benchmarks.split(',') if not (args.skip_pdf and name in PDF_BENCHMARKS)]
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        parser.error('unknown benchmarks: %s' % ', '.join(sorted(unknown)))
+    with open(args.budgets) as budgets_file:
+        budgets = json.load(budgets_file)
+    parameters = {
+        'size': args.size,
+        'companies': args.companies,
+        'customers': args.customers,
+        'months': args.months,
+        'bills_per_payment': args.bills_per_payment,
+    }
+    baseline = {}
+    if not args.write_baseline:
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as baseline_file:
+                baseline_results = json.load(baseline_file)
+            if baseline_results['parameters'] != parameters:
+                parser.error('the baseline was recorded with %s, run with the same parameters' % baseline_results['parameters'])
+            baseline = baseline_results['benchmarks']
+        missing = [name for name in names if 'max_queries_per_record' not in budgets.get(name, {}) and name not in baseline]
+        if missing:
+            parser.error('no baseline for %s, record it with --write-baseline' % ', '.join(missing))
+
+    config.parse_config(['-c', args.config, '-d', args.database])
+    registry = odoo.registry(args.database)
+    results = {}
+    with odoo.api.Environment.manage(), registry.cursor() as cr:
+        env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
+        try:
+            options = argparse.Namespace(**vars(args))
+            options.companies = common.create_companies(env, args.companies)
+            env = env(context=dict(env.context, allowed_company_ids=options.companies.ids))
+            for name in names:
+                results[name] = run_benchmark(env, name, options, budgets.get(name, {}), baseline)
+        finally:
+            cr.rollback()
+
+    for name, result in results.items():
+        first, second = result['runs']
+        print('%-24s %5d records %8.2fs %6d queries | %5d records %8.2fs %6d queries | %6.2f queries/record %s' % (
+            name, first['records'], first['wall_time'], first['queries'],
+            second['records'], second['wall_time'], second['queries'],
+            result['queries_per_record'], 'FAILED' if result['errors'] else 'ok',
+        ))
+        for error in result['errors']:
+            print('    %s' % error)
+    def write_results(path, benchmarks):
+        with open(path, 'w') as output:
+            json.dump({
+                'date': datetime.datetime.utcnow().isoformat(),
+                'database': args.database,
+                'version': odoo.release.version,
+                'parameters': parameters,
+                'benchmarks': benchmarks,
+            }, output, indent=4)
+
+    if args.output:
+        write_results(args.output, results)
+    if args.write_baseline:
+        # the benchmarks that did not run keep their baseline
+        recorded = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as baseline_file:
+                previous = json.load(baseline_file)
+            if previous['parameters'] == parameters:
+                recorded = previous['benchmarks']
+        recorded.update(results)
+        write_results(args.baseline, recorded)
+    if any(result['errors'] for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
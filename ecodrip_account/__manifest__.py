@@ -6,7 +6,7 @@
     'sequence': 100,
     'license': 'OEEL-1',
     'website': 'https://www.odoo.com',
-    'version': '1.1',
+    'version': '1.2',
     'author': 'Odoo Inc',
     'description': """
         Task ID: 2438708
@@ -15,9 +15,12 @@
     'category': 'Custom Development',
 
     # any module necessary for this one to work correctly
-    'depends': ['account', 'account_check_printing', 'l10n_us_check_printing'],
+    'depends': ['account', 'account_check_printing', 'l10n_us_check_printing', 'ecodrip_perf_log'],
     'data': [
+        'security/ir.model.access.csv',
+        'data/ir_cron_data.xml',
         'views/account_move_views.xml',
+        'views/check_pdf_cache_views.xml',
         'views/print_check.xml',
         'views/res_config_settings_views.xml',
     ],
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+
+
+def migrate(cr, version):
+    # the checks saved so far were printed with the current signature, they are not stale
+    if not version:
+        return
+    cr.execute("""
+        UPDATE account_payment payment
+           SET check_signature_checksum = company.account_check_signature_checksum
+          FROM account_move move
+          JOIN res_company company ON company.id = move.company_id
+         WHERE move.id = payment.move_id
+    """)
@@ -1,3 +1,3 @@
 # -*- coding: utf-8 -*-
 
-from . import account_move, account_payment, res_company, res_config_settings
+from . import account_move, account_payment, check_pdf_cache, ir_actions_report, res_company, res_config_settings
@@ -1,10 +1,91 @@
 # -*- coding: utf-8 -*-
 
-from odoo import api, fields, models
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
 
 
 class AccountMove(models.Model):
     _inherit = 'account.move'
 
     early_payment_discount = fields.Monetary(string='Early Payment Discount', currency_field='currency_id')
-    early_payment_deadline = fields.Date(string='Early Payment Deadline')
+    early_payment_deadline = fields.Date(string='Early Payment Deadline', index=True)
+    early_payment_eligible = fields.Boolean(string='Early Payment Discount Available', compute='_compute_early_payment_info',
+                                            search='_search_early_payment_eligible')
+    early_payment_days_left = fields.Integer(string='Days Left for Discount', compute='_compute_early_payment_info')
+
+    def _compute_early_payment_info(self):
+        infos = self._get_early_payment_discount_info()
+        for move in self:
+            info = infos.get(move.id, {})
+            move.early_payment_eligible = info.get('eligible', False)
+            move.early_payment_days_left = info.get('days_to_deadline', 0)
+
+    def _search_early_payment_eligible(self, operator, value):
+        if operator not in ('=', '!=') or not isinstance(value, bool):
+            raise UserError(_('Operation not supported'))
+        # narrow down on the stored fields, then apply the same rule as the check stubs
+        candidates = self.search([
+            ('move_type', '=', 'in_invoice'),
+            ('payment_state', 'in', ('not_paid', 'partial', 'in_payment')),
+            ('early_payment_deadline', '>=', fields.Date.context_today(self)),
+        ])
+        infos = candidates._get_early_payment_discount_info()
+        eligible_ids = [bill_id for bill_id, info in infos.items() if info['eligible']]
+        return [('id', 'in' if (operator == '=') == value else 'not in', eligible_ids)]
+
+    def _is_early_payment_discount_eligible(self, date, last_payment_date):
+        """ Whether paying the bill on ``date`` takes the early payment discount, ``last_payment_date`` being the date of
+            its last payment if any. Used by both the payment runs and the check stubs.
+        """
+        self.ensure_one()
+        return bool(
+            self.move_type == 'in_invoice'
+            and self.payment_state in ('not_paid', 'partial', 'in_payment')
+            and self.early_payment_deadline
+            and date <= self.early_payment_deadline
+            and (not last_payment_date or last_payment_date == date)
+        )
+
+    def _get_early_payment_discount_info(self, date=None):
+        """ Early payment discount of all the bills of the recordset if paid on ``date`` (today by default), with the
+            last payment dates fetched in one grouped query. Returns a dict {bill id: {'eligible', 'discount',
+            'deadline', 'days_to_deadline', 'last_payment_date'}}.
+        """
+        date = date or fields.Date.context_today(self)
+        bills = self.filtered(lambda move: move.move_type == 'in_invoice')
+        last_payment_dates = bills._get_last_payment_dates()
+        infos = {}
+        for bill in bills:
+            last_payment_date = last_payment_dates.get(bill.id)
+            eligible = bill._is_early_payment_discount_eligible(date, last_payment_date)
+            infos[bill.id] = {
+                'eligible': eligible,
+                'discount': bill.early_payment_discount if eligible else 0,
+                'deadline': bill.early_payment_deadline,
+                'days_to_deadline': (bill.early_payment_deadline - date).days if bill.early_payment_deadline else 0,
+                'last_payment_date': last_payment_date,
+            }
+        return infos
+
+    def _get_last_payment_dates(self):
+        """ Date of the last payment reconciled with each move of the recordset, in one grouped query.
+            Returns a dict {move id: date}, moves without payment are left out.
+        """
+        if not self:
+            return {}
+        self.env['account.move.line'].flush(['move_id'])
+        self.env['account.partial.reconcile'].flush(['debit_move_id', 'credit_move_id'])
+        self.env['account.payment'].flush(['move_id'])
+        self.flush(['date'])
+        self.env.cr.execute("""
+            SELECT line.move_id, MAX(payment_move.date)
+              FROM account_move_line line
+              JOIN account_partial_reconcile part ON line.id IN (part.debit_move_id, part.credit_move_id)
+              JOIN account_move_line counterpart ON counterpart.id IN (part.debit_move_id, part.credit_move_id)
+                                                AND counterpart.id != line.id
+              JOIN account_payment payment ON payment.move_id = counterpart.move_id
+              JOIN account_move payment_move ON payment_move.id = payment.move_id
+             WHERE line.move_id IN %s
+          GROUP BY line.move_id
+        """, [tuple(self.ids)])
+        return dict(self.env.cr.fetchall())
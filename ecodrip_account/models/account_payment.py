@@ -1,23 +1,52 @@
 # -*- coding: utf-8 -*-
 
+import hashlib
+import json
+import threading
+import time
+
 from odoo import api, fields, models
 from odoo.exceptions import UserError, ValidationError, RedirectWarning
+from odoo.tools import split_every
 from odoo.tools.misc import formatLang, format_date
+from odoo.tools.safe_eval import safe_eval
+from odoo.addons.ecodrip_perf_log.models.perf_log import tracked
 
 INV_LINES_PER_STUB = 9
+CHECK_PDF_REGENERATE_BATCH = 50
 
 class AccountPayment(models.Model):
     _inherit = 'account.payment'
 
+    check_stub_lines = fields.Text(compute='_compute_check_stub_lines', help='Technical field: stub lines of the check, in json.')
+    check_signature_checksum = fields.Char(readonly=True, copy=False, help='Technical field: checksum of the signature on the saved check PDF.')
+
     def _check_build_page_info(self, i, p):
         page = super(AccountPayment, self)._check_build_page_info(i, p)
         page.update(company=self.company_id)
         return page
 
-    def _check_make_stub_pages(self):
-        """ The stub is the summary of paid invoices. It may spill on several pages, in which case only the check on
-            first page is valid. This function returns a list of stub lines per page.
+    @api.depends('date', 'line_ids.matched_debit_ids', 'line_ids.matched_credit_ids')
+    @api.depends_context('lang')
+    @tracked('check_stub_lines')
+    def _compute_check_stub_lines(self):
+        """ Stub lines of every payment of the recordset (e.g. a whole check run) at once: the reconciliations and the
+            last payment date of the bills are fetched for all the payments together, then each stub is built in memory.
         """
+        term_lines = self.line_ids.filtered(lambda line: line.account_id.internal_type in ('receivable', 'payable'))
+        bills = (term_lines.matched_debit_ids.debit_move_id.move_id + term_lines.matched_credit_ids.credit_move_id.move_id)\
+            .filtered(lambda x: x.is_outbound())
+        discount_infos = bills.filtered(lambda x: x.payment_state == 'in_payment' and x.move_type == 'in_invoice')._get_early_payment_discount_info()
+
+        for pay in self:
+            pay_term_lines = term_lines.filtered(lambda line: line.move_id == pay.move_id)
+            stub_lines = pay._check_prepare_stub_lines(pay_term_lines, discount_infos)
+            for stub_line in stub_lines:
+                if stub_line.get('currency'):
+                    stub_line['currency'] = stub_line['currency'].id
+            pay.check_stub_lines = json.dumps(stub_lines)
+
+    def _check_prepare_stub_lines(self, term_lines, discount_infos):
         self.ensure_one()
 
         def prepare_vals(invoice, partials):
@@ -37,12 +66,14 @@ class AccountPayment(models.Model):
                 amount_residual_str = formatLang(self.env, invoice_sign * invoice.amount_residual, currency_obj=invoice.currency_id)
 
             if invoice.payment_state == 'in_payment' and invoice.move_type == 'in_invoice':
-                last_payment_date = max([date for date in self.env['account.payment'].search([('reconciled_bill_ids', 'in', invoice.ids)]).mapped('date') if date], default=None)
-                if last_payment_date and invoice.early_payment_deadline and self.date == last_payment_date and self.date <= invoice.early_payment_deadline:
+                # same rule as the payment runs, at the date of this payment
+                last_payment_date = discount_infos[invoice.id]['last_payment_date']
+                if last_payment_date and invoice._is_early_payment_discount_eligible(self.date, last_payment_date):
                     discount = invoice.early_payment_discount
                 else:
                     discount = 0
-                invoice_payment_reconcile = invoice.line_ids.mapped('matched_debit_ids').filtered(lambda r: r.debit_move_id in self.line_ids)
+                # the partials of the bill debited by this payment
+                invoice_payment_reconcile = partials.filtered(lambda r: r.debit_move_id in term_lines)
 
                 if self.currency_id != self.journal_id.company_id.currency_id:
                     payment = abs(sum(invoice_payment_reconcile.mapped('amount_currency'))) - discount
@@ -64,7 +95,6 @@ class AccountPayment(models.Model):
             return stub_line
 
         # Decode the reconciliation to keep only invoices.
-        term_lines = self.line_ids.filtered(lambda line: line.account_id.internal_type in ('receivable', 'payable'))
         invoices = (term_lines.matched_debit_ids.debit_move_id.move_id + term_lines.matched_credit_ids.credit_move_id.move_id)\
             .filtered(lambda x: x.is_outbound())
         invoices = invoices.sorted(lambda x: x.invoice_date_due or x.date)
@@ -94,6 +124,19 @@ class AccountPayment(models.Model):
             stub_lines = [prepare_vals(invoice, partials)
                           for invoice, partials in invoice_map.items()
                           if invoice.move_type == 'in_invoice']
+        return stub_lines
+
+    def _check_make_stub_pages(self):
+        """ The stub is the summary of paid invoices. It may spill on several pages, in which case only the check on
+            first page is valid. This function returns a list of stub lines per page.
+        """
+        self.ensure_one()
+
+        # computed for all the payments being printed together
+        stub_lines = json.loads(self.check_stub_lines)
+        for stub_line in stub_lines:
+            if stub_line.get('currency'):
+                stub_line['currency'] = self.env['res.currency'].browse(stub_line['currency'])
 
         # Crop the stub lines or split them on multiple pages
         if not self.company_id.account_check_printing_multi_stub:
@@ -114,6 +157,55 @@ class AccountPayment(models.Model):
 
         return stub_pages
 
+    def _check_pdf_is_stale(self):
+        self.ensure_one()
+        return self.check_signature_checksum != self.company_id.account_check_signature_checksum
+
+    def _check_pdf_cache_keys(self, report):
+        """ Key of the rendered check of each payment: a hash of the pages printed (amounts, stub lines, partner...),
+            the layout, the signature and the report templates. Any change to them gives another key.
+            Returns a dict {payment id: key}.
+        """
+        self.env.cr.execute("SELECT MAX(write_date) FROM ir_ui_view WHERE type = 'qweb'")
+        templates_date = str(self.env.cr.fetchone()[0])
+
+        def serialize(value):
+            if isinstance(value, models.BaseModel):
+                return [value._name, value.ids, [str(date) for date in value.mapped('write_date')]]
+            return str(value)
+
+        keys = {}
+        for payment in self:
+            content = {
+                'pages': payment._check_get_pages(),
+                'layout': payment.company_id.account_check_printing_layout,
+                'signature': payment.company_id.account_check_signature_checksum,
+                'report': [report.id, str(report.write_date), templates_date],
+                'lang': self.env.lang,
+            }
+            keys[payment.id] = hashlib.sha256(json.dumps(content, sort_keys=True, default=serialize).encode()).hexdigest()
+        return keys
+
+    @api.model
+    @tracked('check_signature_regeneration')
+    def _cron_regenerate_check_pdf(self):
+        """ Render again, by batches, the saved check PDFs printed with a signature that is not the current one. """
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        for company in self.env['res.company'].search([]):
+            report = self.env.ref(company.account_check_printing_layout or '', raise_if_not_found=False)
+            if not report or not report.attachment:
+                continue
+            attachments = self.env['ir.attachment'].search([('company_id', '=', company.id), ('res_model', '=', 'account.payment'), ('res_id', '!=', False)])
+            payments = self.browse(list(set(attachments.mapped('res_id')))).exists().filtered(lambda pay: pay._check_pdf_is_stale())
+            for batch in split_every(CHECK_PDF_REGENERATE_BATCH, payments):
+                for payment in batch:
+                    # only the check itself, not the other documents attached to the payment
+                    name = safe_eval(report.attachment, {'object': payment, 'time': time})
+                    attachments.filtered(lambda att: att.res_id == payment.id and att.name == name).sudo().unlink()
+                    report._render_qweb_pdf(res_ids=payment.ids)
+                if auto_commit:
+                    self.env.cr.commit()
+
     # def _check_make_stub_line(self, invoice):
     #     stub_line = super(AccountPayment, self)._check_make_stub_line(invoice)
     #     print("\n")
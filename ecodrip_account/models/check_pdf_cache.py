@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import base64
+import logging
+from datetime import timedelta
+
+import psycopg2
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+CHECK_PDF_CACHE_MAX_AGE = 30  # days without being printed
+CHECK_PDF_CACHE_MAX_SIZE = 500  # MB
+
+
+class CheckPdfCache(models.Model):
+    _name = 'ecodrip.check.pdf.cache'
+    _description = 'Rendered Check PDF'
+    _order = 'last_used desc, id desc'
+    _rec_name = 'key'
+
+    key = fields.Char('Key', required=True, readonly=True, index=True, help='Hash of everything printed on the check.')
+    datas = fields.Binary('PDF', attachment=True, readonly=True)
+    file_size = fields.Integer('Size', readonly=True)
+    company_id = fields.Many2one('res.company', string='Company', readonly=True, ondelete='cascade')
+    hit_count = fields.Integer('Hits', readonly=True, help='Number of times the check was printed without being rendered.')
+    miss_count = fields.Integer('Misses', readonly=True, default=1, help='Number of times the check was rendered.')
+    last_used = fields.Datetime('Last Printed On', readonly=True, index=True)
+
+    _sql_constraints = [
+        ('key_uniq', 'unique(key)', 'A check PDF is cached only once.'),
+    ]
+
+    @api.model
+    def _fetch(self, keys):
+        """ Return the cached PDFs of ``keys`` as a dict {key: pdf bytes} and count them as hits. """
+        entries = self.search([('key', 'in', list(keys))])
+        if entries:
+            self.env.cr.execute("""
+                UPDATE ecodrip_check_pdf_cache
+                   SET hit_count = hit_count + 1, last_used = (now() at time zone 'UTC')
+                 WHERE id IN %s
+            """, [tuple(entries.ids)])
+        return {entry.key: base64.b64decode(entry.datas) for entry in entries}
+
+    @api.model
+    def _store(self, key, pdf, company):
+        try:
+            with self.env.cr.savepoint():
+                self.create({
+                    'key': key,
+                    'datas': base64.b64encode(pdf),
+                    'file_size': len(pdf),
+                    'company_id': company.id,
+                    'last_used': fields.Datetime.now(),
+                })
+        except psycopg2.IntegrityError:
+            # the same check was rendered and cached concurrently, it is a miss all the same: counted on the entry of
+            # the other transaction, which only a new snapshot sees
+            with self.pool.cursor() as cr:
+                cr.execute("UPDATE ecodrip_check_pdf_cache SET miss_count = miss_count + 1 WHERE key = %s", [key])
+
+    @api.model
+    def _get_stats(self):
+        """ Hits and misses since the cache exists: those of the entries, and those of the entries evicted. """
+        ICP = self.env['ir.config_parameter'].sudo()
+        totals = self.read_group([], ['hit_count', 'miss_count'], [])
+        return {
+            'hits': (totals and totals[0]['hit_count'] or 0) + int(ICP.get_param('ecodrip_account.check_pdf_cache_evicted_hits', 0)),
+            'misses': (totals and totals[0]['miss_count'] or 0) + int(ICP.get_param('ecodrip_account.check_pdf_cache_evicted_misses', 0)),
+        }
+
+    @api.autovacuum
+    def _gc_check_pdf_cache(self):
+        ICP = self.env['ir.config_parameter'].sudo()
+        max_age = int(ICP.get_param('ecodrip_account.check_pdf_cache_max_age', CHECK_PDF_CACHE_MAX_AGE))
+        max_size = int(ICP.get_param('ecodrip_account.check_pdf_cache_max_size', CHECK_PDF_CACHE_MAX_SIZE)) * 1024 * 1024
+
+        expired = self.search([('last_used', '<', fields.Datetime.now() - timedelta(days=max_age))])
+        # then the least recently printed ones, until the cache fits in its size
+        self.env.cr.execute("""
+            SELECT id
+              FROM (SELECT id, SUM(file_size) OVER (ORDER BY last_used DESC, id DESC) AS cumulated_size
+                      FROM ecodrip_check_pdf_cache
+                     WHERE id NOT IN %s) AS entries
+             WHERE cumulated_size > %s
+        """, [tuple(expired.ids) or (0,), max_size])
+        oversized = self.browse([row[0] for row in self.env.cr.fetchall()])
+        _logger.info('Check PDF cache: %s expired and %s oversized entries removed', len(expired), len(oversized))
+        evicted = expired | oversized
+        # the counters survive their entries
+        for counter, field_name in (('evicted_hits', 'hit_count'), ('evicted_misses', 'miss_count')):
+            key = 'ecodrip_account.check_pdf_cache_%s' % counter
+            ICP.set_param(key, int(ICP.get_param(key, 0)) + sum(evicted.mapped(field_name)))
+        evicted.unlink()
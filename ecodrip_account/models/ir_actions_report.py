@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+import io
+import logging
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from PyPDF2 import PdfFileReader, PdfFileWriter
+
+from odoo import api, fields, models, tools, _
+from odoo.addons.base.models.ir_actions_report import _get_wkhtmltopdf_bin
+from odoo.exceptions import UserError
+from odoo.tools import split_every
+from odoo.tools.pdf import merge_pdf
+
+_logger = logging.getLogger(__name__)
+
+CHECK_PRINT_WORKERS = 1
+CHECK_PRINT_CHUNK_SIZE = 50
+
+
+def _run_wkhtmltopdf_command(command):
+    # called from the worker threads: no ORM here, only the wkhtmltopdf process
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = process.communicate()
+    return process.returncode, err
+
+
+class IrActionsReport(models.Model):
+    _inherit = 'ir.actions.report'
+
+    def retrieve_attachment(self, record):
+        attachment = super(IrActionsReport, self).retrieve_attachment(record)
+        if attachment and record._name == 'account.payment' and record._check_pdf_is_stale():
+            # printed with a previous signature: drop it so that the check is rendered and saved again
+            attachment.sudo().unlink()
+            return self.env['ir.attachment']
+        return attachment
+
+    def _postprocess_pdf_report(self, record, buffer):
+        res = super(IrActionsReport, self)._postprocess_pdf_report(record, buffer)
+        if self.attachment and record._name == 'account.payment':
+            record.sudo().check_signature_checksum = record.company_id.account_check_signature_checksum
+        return res
+
+    def _is_check_report(self):
+        return self.model == 'account.payment' and self.report_name.startswith('l10n_us_check_printing.')
+
+    def _render_qweb_pdf(self, res_ids=None, data=None):
+        testing = (tools.config['test_enable'] or tools.config['test_file']) and not self.env.context.get('force_report_rendering')
+        # the report controller always passes the context along in data, it is already in self.env.context
+        custom_data = data and set(data) - {'context', 'report_type'}
+        if testing or not res_ids or custom_data or not self._is_check_report():
+            return super(IrActionsReport, self)._render_qweb_pdf(res_ids=res_ids, data=data)
+
+        with self.env['ecodrip.perf.log']._track('check_report_render', len(res_ids)):
+            # a check printed with exactly the same content is not rendered again
+            payments = self.env['account.payment'].browse(res_ids)
+            keys = payments._check_pdf_cache_keys(self)
+            Cache = self.env['ecodrip.check.pdf.cache'].sudo()
+            pdfs = Cache._fetch(set(keys.values()))
+            missing = payments.filtered(lambda pay: keys[pay.id] not in pdfs)
+            for payment, pdf in self._render_check_pdfs(missing):
+                pdfs[keys[payment.id]] = pdf
+                Cache._store(keys[payment.id], pdf, payment.company_id)
+            return merge_pdf([pdfs[keys[payment.id]] for payment in payments]), 'pdf'
+
+    def _render_check_pdfs(self, payments):
+        """ Render the checks of ``payments`` and yield (payment, pdf content) for each of them. """
+        if not payments:
+            return
+        if not self.attachment and len(payments) > 1:
+            # render them together, by chunks rendered in parallel for big check runs
+            ICP = self.env['ir.config_parameter'].sudo()
+            workers = int(ICP.get_param('ecodrip_account.check_print_workers', CHECK_PRINT_WORKERS))
+            chunk_size = int(ICP.get_param('ecodrip_account.check_print_chunk_size', CHECK_PRINT_CHUNK_SIZE))
+            if workers > 1 and len(payments) > chunk_size:
+                chunks = [payments.browse(ids) for ids in split_every(chunk_size, payments.ids)]
+                pdf_contents = self._render_check_chunks_parallel(chunks, workers)
+            else:
+                chunks = [payments]
+                pdf_contents = [super(IrActionsReport, self)._render_qweb_pdf(res_ids=payments.ids)[0]]
+            for chunk, pdf_content in zip(chunks, pdf_contents):
+                checks = self._split_check_pdf(chunk, pdf_content)
+                if checks is None:
+                    # the pages don't match: one check at a time
+                    checks = [(payment, super(IrActionsReport, self)._render_qweb_pdf(res_ids=payment.ids)[0]) for payment in chunk]
+                yield from checks
+            return
+        # saved as attachments one by one
+        for payment in payments:
+            yield payment, super(IrActionsReport, self)._render_qweb_pdf(res_ids=payment.ids)[0]
+
+    def _split_check_pdf(self, payments, pdf_content):
+        """ Cut the pdf of several checks in one pdf per payment: each page of _check_get_pages() is a page of the pdf.
+            Returns a list of (payment, pdf content), or None if the number of pages is not the expected one.
+        """
+        page_counts = [len(payment._check_get_pages()) for payment in payments]
+        reader = PdfFileReader(io.BytesIO(pdf_content), strict=False)
+        if reader.getNumPages() != sum(page_counts):
+            return None
+        checks = []
+        page = 0
+        for payment, page_count in zip(payments, page_counts):
+            writer = PdfFileWriter()
+            for i in range(page, page + page_count):
+                writer.addPage(reader.getPage(i))
+            page += page_count
+            stream = io.BytesIO()
+            writer.write(stream)
+            checks.append((payment, stream.getvalue()))
+        return checks
+
+    def _render_check_chunks_parallel(self, chunks, workers):
+        """ Render each chunk of payments in its own pdf, up to ``workers`` wkhtmltopdf processes at the same time.
+            The html is rendered here since QWeb needs the ORM, only the conversions to pdf run concurrently.
+            Returns the pdf contents in the order of the chunks.
+        """
+        context = dict(self.env.context, debug=False)
+        if not tools.config['test_enable']:
+            context['commit_assetsbundle'] = True
+        report = self.sudo().with_context(context)
+        paperformat = report.get_paperformat()
+
+        jobs = []
+        temporary_files = []
+        try:
+            for chunk in chunks:
+                html = report._render_qweb_html(chunk.ids)[0]
+                bodies, html_ids, header, footer, specific_paperformat_args = report._prepare_html(html)
+                command_args = report._build_wkhtmltopdf_args(
+                    paperformat,
+                    context.get('landscape'),
+                    specific_paperformat_args=specific_paperformat_args,
+                    set_viewport_size=context.get('set_viewport_size'),
+                )
+                files_command_args = []
+                for option, content in (('--header-html', header), ('--footer-html', footer)):
+                    if content:
+                        files_command_args.extend([option, self._write_report_temporary_file(content, '.html', temporary_files)])
+                paths = [self._write_report_temporary_file(body, '.html', temporary_files) for body in bodies]
+                pdf_report_path = self._write_report_temporary_file(b'', '.pdf', temporary_files)
+                jobs.append(([_get_wkhtmltopdf_bin()] + command_args + files_command_args + paths + [pdf_report_path], pdf_report_path))
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_run_wkhtmltopdf_command, [command for command, pdf_report_path in jobs]))
+
+            pdf_contents = []
+            for (command, pdf_report_path), (returncode, err) in zip(jobs, results):
+                if returncode not in [0, 1]:
+                    raise UserError(_('Wkhtmltopdf failed (error code: %s). Message: %s') % (returncode, err[-1000:].decode(errors='replace')))
+                with open(pdf_report_path, 'rb') as pdf_document:
+                    pdf_contents.append(pdf_document.read())
+            return pdf_contents
+        finally:
+            for temporary_file in temporary_files:
+                try:
+                    os.unlink(temporary_file)
+                except (OSError, IOError):
+                    _logger.error('Error when trying to remove file %s', temporary_file)
+
+    def _write_report_temporary_file(self, content, suffix, temporary_files):
+        file_fd, file_path = tempfile.mkstemp(suffix=suffix, prefix='report.check.tmp.')
+        with os.fdopen(file_fd, 'wb') as report_file:
+            report_file.write(content)
+        temporary_files.append(file_path)
+        return file_path
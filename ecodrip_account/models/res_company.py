@@ -1,23 +1,43 @@
 # -*- coding: utf-8 -*-
-from datetime import datetime
+import hashlib
 
 from odoo import api, fields, models
+from odoo.http import request
+from odoo.tools.image import image_data_uri
 
 
 class ResCompany(models.Model):
     _inherit = 'res.company'
 
     account_check_signature_image = fields.Binary('Signature')
+    # resized once on upload to what is printed (1.5in x 0.5in at 300 dpi)
+    account_check_signature_print = fields.Image('Printed Signature', related='account_check_signature_image', max_width=450, max_height=150, store=True)
+    # checks printed with another signature are stale, see account.payment._check_pdf_is_stale()
+    account_check_signature_checksum = fields.Char('Signature Checksum', compute='_compute_account_check_signature_checksum', store=True)
+
+    @api.depends('account_check_signature_image')
+    def _compute_account_check_signature_checksum(self):
+        for company in self:
+            image = company.with_context(bin_size=False).account_check_signature_image
+            company.account_check_signature_checksum = image and hashlib.sha1(image).hexdigest() or False
+
+    def _get_check_signature_src(self):
+        """ Source of the signature image on the checks. With a session (passed on to wkhtmltopdf) it is a url unique
+            per signature, fetched once per document instead of embedding the image on every check.
+        """
+        self.ensure_one()
+        if not self.with_context(bin_size=True).account_check_signature_print:
+            return False
+        if request:
+            return '/web/image/res.company/%s/account_check_signature_print?unique=%s' % (self.id, self.account_check_signature_checksum)
+        return image_data_uri(self.account_check_signature_print)
 
     def write(self, vals):
-        res = super(ResCompany, self).write(vals)
-        if vals.get('account_check_signature_image'):
-            for company in self:
-                report = self.env.ref('%s' % company.account_check_printing_layout)
-                if report.attachment:
-                    checks = self.env['ir.attachment'].search(['&', ('company_id', '=', company.id), ('res_model', '=', 'account.payment')])
-                    for check in checks:
-                        record = self.env['account.payment'].browse(check.res_id)
-                        check.sudo().unlink()
-                        pdf = report.render_qweb_pdf(res_ids=[record.id])[0]
+        if 'account_check_signature_image' not in vals:
+            return super(ResCompany, self).write(vals)
+        with self.env['ecodrip.perf.log']._track('check_signature_write', len(self)):
+            res = super(ResCompany, self).write(vals)
+            # don't render the checks again here, they are only stale: the cron renders them in the background
+            # and any check opened in the meantime is rendered on the fly
+            self.env.ref('ecodrip_account.ir_cron_regenerate_check_pdf')._trigger()
         return res
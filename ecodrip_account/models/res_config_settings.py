@@ -7,3 +7,11 @@ class ResConfigSetting(models.TransientModel):
     _inherit = 'res.config.settings'
 
     account_check_signature_image = fields.Binary(string='Signature', related='company_id.account_check_signature_image', readonly=False)
+    check_pdf_cache_hits = fields.Integer(string='Check PDF Cache Hits', compute='_compute_check_pdf_cache_stats')
+    check_pdf_cache_misses = fields.Integer(string='Check PDF Cache Misses', compute='_compute_check_pdf_cache_stats')
+
+    def _compute_check_pdf_cache_stats(self):
+        stats = self.env['ecodrip.check.pdf.cache'].sudo()._get_stats()
+        for settings in self:
+            settings.check_pdf_cache_hits = stats['hits']
+            settings.check_pdf_cache_misses = stats['misses']
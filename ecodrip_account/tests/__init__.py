@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+
+from . import test_check_print, test_check_stub, test_early_payment_discount
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import io
+from unittest.mock import patch
+
+from PyPDF2 import PdfFileReader, PdfFileWriter
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.tests import tagged
+
+
+def _blank_pdf():
+    writer = PdfFileWriter()
+    writer.addBlankPage(width=612, height=792)
+    stream = io.BytesIO()
+    writer.write(stream)
+    return stream.getvalue()
+
+
+@tagged('post_install', '-at_install')
+class TestCheckPrint(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.company = cls.company_data['company']
+        cls.company.account_check_printing_layout = 'l10n_us_check_printing.action_print_check_top'
+        cls.report = cls.env.ref('l10n_us_check_printing.action_print_check_top')
+        cls.payment_method_check = cls.env.ref('account_check_printing.account_payment_method_check')
+        bank_journal = cls.company_data['default_journal_bank']
+        bank_journal.outbound_payment_method_ids |= cls.payment_method_check
+        cls.payments = cls.env['account.payment'].create([{
+            'payment_type': 'outbound',
+            'partner_type': 'supplier',
+            'partner_id': cls.partner_a.id,
+            'amount': amount,
+            'journal_id': bank_journal.id,
+            'payment_method_id': cls.payment_method_check.id,
+        } for amount in (100.0, 200.0)])
+        cls.payments.action_post()
+
+    def _print_from_controller(self):
+        # what /report/download does through the report_routes controller
+        context = {'lang': 'en_US'}
+        report = self.report.with_context(context, force_report_rendering=True)
+        return report._render_qweb_pdf(self.payments.ids, data={'context': context, 'report_type': 'pdf'})
+
+    def test_controller_print_uses_check_cache(self):
+        rendered = []
+
+        def render_check_pdfs(report, payments):
+            rendered.extend(payments.ids)
+            for payment in payments:
+                yield payment, _blank_pdf()
+
+        with patch.object(type(self.report), '_render_check_pdfs', render_check_pdfs):
+            pdf, report_type = self._print_from_controller()
+            self.assertEqual(report_type, 'pdf')
+            self.assertEqual(PdfFileReader(io.BytesIO(pdf)).getNumPages(), 2)
+            self.assertEqual(sorted(rendered), sorted(self.payments.ids))
+
+            # printed again from the web client: nothing is rendered
+            self._print_from_controller()
+            self.assertEqual(sorted(rendered), sorted(self.payments.ids))
+
+        self.env['ecodrip.check.pdf.cache'].invalidate_cache()
+        cache = self.env['ecodrip.check.pdf.cache'].search([('company_id', '=', self.company.id)])
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(sum(cache.mapped('hit_count')), 2)
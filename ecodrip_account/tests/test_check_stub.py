@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+from unittest.mock import patch
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import fields
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.tests import tagged
+from odoo.tools.misc import formatLang
+
+
+@tagged('post_install', '-at_install')
+class TestCheckStub(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.company = cls.company_data['company']
+        cls.payable = cls.company_data['default_account_payable']
+        cls.today = fields.Date.context_today(cls.env.user)
+        bank_journal = cls.company_data['default_journal_bank']
+        payment_method_check = cls.env.ref('account_check_printing.account_payment_method_check')
+        bank_journal.outbound_payment_method_ids |= payment_method_check
+
+        # 7 bills and a refund: 10 stub lines with the Bills and Refunds headers
+        cls.bills = cls.env['account.move'].create([{
+            'move_type': 'in_invoice',
+            'partner_id': cls.partner_a.id,
+            'invoice_date': cls.today - relativedelta(days=5),
+            'invoice_date_due': cls.today + relativedelta(days=index + 1),
+            'invoice_payment_term_id': False,
+            'invoice_line_ids': [(0, 0, {'name': 'Drip lines', 'quantity': 1, 'price_unit': 100.0 * (index + 1), 'tax_ids': []})],
+        } for index in range(7)])
+        cls.bills[0].write({'early_payment_discount': 20.0, 'early_payment_deadline': cls.today + relativedelta(days=10)})
+        cls.bills[1].write({'early_payment_discount': 30.0, 'early_payment_deadline': cls.today + relativedelta(days=10)})
+        cls.bills[2].write({'early_payment_discount': 15.0, 'early_payment_deadline': cls.today - relativedelta(days=1)})
+        cls.bills.action_post()
+        cls.refund = cls.env['account.move'].create({
+            'move_type': 'out_refund',
+            'partner_id': cls.partner_a.id,
+            'invoice_date': cls.today - relativedelta(days=5),
+            'invoice_date_due': cls.today + relativedelta(days=20),
+            'line_ids': [
+                (0, 0, {'name': 'Returned emitters', 'account_id': cls.company_data['default_account_revenue'].id, 'debit': 50.0, 'quantity': 1, 'price_unit': 50.0}),
+                (0, 0, {'name': 'Returned emitters', 'account_id': cls.payable.id, 'credit': 50.0, 'exclude_from_invoice_tab': True, 'date_maturity': cls.today + relativedelta(days=20)}),
+            ],
+        })
+        cls.refund.action_post()
+
+        # the second bill was paid in part before the check
+        cls.env['account.payment.register'].with_context(active_model='account.move', active_ids=cls.bills[1].ids).create({
+            'payment_date': cls.today - relativedelta(days=1),
+            'amount': 100.0,
+        })._create_payments()
+
+        cls.payment = cls.env['account.payment'].create({
+            'payment_type': 'outbound',
+            'partner_type': 'supplier',
+            'partner_id': cls.partner_a.id,
+            'date': cls.today,
+            'amount': sum(cls.bills.mapped('amount_residual')) + cls.refund.amount_residual,
+            'journal_id': bank_journal.id,
+            'payment_method_id': payment_method_check.id,
+        })
+        cls.payment.action_post()
+        # the discounts only apply to the bills in payment, whether or not the accountant app is installed
+        with patch.object(type(cls.env['account.move']), '_get_invoice_in_payment_state', lambda self: 'in_payment'):
+            (cls.bills + cls.refund + cls.payment.move_id).line_ids\
+                .filtered(lambda line: line.account_id == cls.payable and not line.reconciled)\
+                .reconcile()
+            cls.env['account.move'].flush()
+
+    def _describe(self, stub_pages):
+        return [[
+            ('header', line['name']) if line.get('header') else (line['number'], line['discount'], line['amount_paid'])
+            for line in page
+        ] for page in stub_pages]
+
+    def _expected_lines(self):
+        def line(move, discount, amount_paid):
+            return move.name, discount, formatLang(self.env, amount_paid, currency_obj=self.company.currency_id)
+
+        self.assertEqual(set(self.bills.mapped('payment_state')), {'in_payment'})
+        return [
+            ('header', 'Bills'),
+            # paid in full on time
+            line(self.bills[0], 20.0, 100.0 - 20.0),
+            # the rest paid by the check on time, after a first payment
+            line(self.bills[1], 30.0, 100.0 - 30.0),
+            # paid after the deadline
+            line(self.bills[2], 0, 300.0),
+            line(self.bills[3], 0, 400.0),
+            line(self.bills[4], 0, 500.0),
+            line(self.bills[5], 0, 600.0),
+            line(self.bills[6], 0, 700.0),
+            ('header', 'Refunds'),
+            line(self.refund, 0, 50.0),
+        ]
+
+    def test_multi_stub(self):
+        self.company.account_check_printing_multi_stub = True
+        lines = self._expected_lines()
+        # the Refunds header would end the first page: it starts the second one
+        self.assertEqual(self._describe(self.payment._check_make_stub_pages()), [lines[:8], lines[8:]])
+
+    def test_single_stub(self):
+        self.company.account_check_printing_multi_stub = False
+        lines = self._expected_lines()
+        # cropped, with room left for the ellipsis line
+        self.assertEqual(self._describe(self.payment._check_make_stub_pages()), [lines[:8]])
+
+    def test_stub_lines_of_check_run(self):
+        # computed for a whole check run, the stubs are the same as computed alone
+        other = self.payment.copy({'amount': 10.0})
+        other.action_post()
+        payments = self.payment | other
+        payments.mapped('check_stub_lines')
+        stub_lines = self.payment.check_stub_lines
+        self.payment.invalidate_cache(['check_stub_lines'])
+        self.assertEqual(self.payment.check_stub_lines, stub_lines)
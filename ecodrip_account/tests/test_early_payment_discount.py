@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from dateutil.relativedelta import relativedelta
+
+from odoo import fields
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.tests import tagged
+
+
+@tagged('post_install', '-at_install')
+class TestEarlyPaymentDiscount(AccountTestInvoicingCommon):
+
+    def _create_bill(self, today):
+        bill = self.env['account.move'].create({
+            'move_type': 'in_invoice',
+            'partner_id': self.partner_a.id,
+            'invoice_date': today,
+            'early_payment_discount': 20.0,
+            'early_payment_deadline': today + relativedelta(days=10),
+            'invoice_line_ids': [(0, 0, {'name': 'Drip lines', 'quantity': 1, 'price_unit': 1000.0, 'tax_ids': []})],
+        })
+        bill.action_post()
+        return bill
+
+    def test_search_matches_resolver(self):
+        today = fields.Date.context_today(self.env.user)
+        bill = self._create_bill(today)
+        partially_paid = self._create_bill(today)
+        # paid in part yesterday: the discount is not available anymore
+        self.env['account.payment.register'].with_context(active_model='account.move', active_ids=partially_paid.ids).create({
+            'payment_date': today - relativedelta(days=1),
+            'amount': 100.0,
+        })._create_payments()
+        bills = bill | partially_paid
+
+        infos = bills._get_early_payment_discount_info()
+        self.assertTrue(infos[bill.id]['eligible'])
+        self.assertFalse(infos[partially_paid.id]['eligible'])
+        self.assertEqual(self.env['account.move'].search([('id', 'in', bills.ids), ('early_payment_eligible', '=', True)]), bill)
+        self.assertEqual(self.env['account.move'].search([('id', 'in', bills.ids), ('early_payment_eligible', '=', False)]), partially_paid)
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+{
+    'name': 'Eco-Drip: Performance Logs',
+    'summary': 'Eco-Drip: Wall time, queries and memory of the APR and check printing runs',
+    'sequence': 100,
+    'license': 'OEEL-1',
+    'website': 'https://www.odoo.com',
+    'version': '1.0',
+    'author': 'Odoo Inc',
+    'description': """
+        - Log of each APR generation, check print and check signature change: wall time, SQL queries and time,
+          moves created and posted, peak memory
+        - Optional cProfile capture of each run, enabled in the general settings
+    """,
+    'category': 'Custom Development',
+
+    # any module necessary for this one to work correctly
+    'depends': ['account'],
+    'data': [
+        'security/ir.model.access.csv',
+        'views/perf_log_views.xml',
+        'views/res_config_settings_views.xml',
+    ],
+    'installable': True,
+    'application': False,
+    'auto_install': False,
+}
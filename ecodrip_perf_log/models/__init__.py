@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+
+from . import perf_log, account_move, res_config_settings
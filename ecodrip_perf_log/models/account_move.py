@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, models
+
+from .perf_log import count_records
+
+
+class AccountMove(models.Model):
+    _inherit = 'account.move'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        moves = super(AccountMove, self).create(vals_list)
+        count_records('create_count', len(moves))
+        return moves
+
+    def _post(self, soft=True):
+        posted = super(AccountMove, self)._post(soft=soft)
+        count_records('post_count', len(posted))
+        return posted
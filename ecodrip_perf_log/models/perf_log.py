@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+import base64
+import cProfile
+import functools
+import json
+import logging
+import marshal
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import timedelta
+
+from odoo import api, fields, models
+from odoo.tools import str2bool
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+_logger = logging.getLogger(__name__)
+
+PERF_LOG_MAX_AGE = 90  # days
+
+# the runs being measured in each thread, innermost last
+_local = threading.local()
+
+
+def _get_max_rss():
+    # highest resident memory of the process since it started, in kB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else 0
+
+
+def count_records(counter, count):
+    """ Add ``count`` to ``counter`` on all the runs being measured in the current thread. """
+    for run in getattr(_local, 'runs', ()):
+        run[counter] += count
+
+
+def tracked(operation):
+    """ Decorate a model method to log each of its calls as a run of ``operation``. """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.env['ecodrip.perf.log']._track(operation, len(self)):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class PerfLog(models.Model):
+    _name = 'ecodrip.perf.log'
+    _description = 'Performance Log'
+    _order = 'date_start desc, id desc'
+    _rec_name = 'operation'
+
+    operation = fields.Char('Operation', required=True, readonly=True, index=True)
+    date_start = fields.Datetime('Started On', readonly=True, index=True)
+    user_id = fields.Many2one('res.users', string='User', readonly=True, ondelete='set null')
+    company_id = fields.Many2one('res.company', string='Company', readonly=True, ondelete='cascade')
+    record_count = fields.Integer('Records', readonly=True)
+    state = fields.Selection([('done', 'Done'), ('failed', 'Failed')], string='Status', readonly=True)
+    error = fields.Char('Error', readonly=True)
+    wall_time = fields.Float('Wall Time (s)', digits=(16, 3), readonly=True)
+    query_count = fields.Integer('SQL Queries', readonly=True)
+    query_time = fields.Float('SQL Time (s)', digits=(16, 3), readonly=True)
+    create_count = fields.Integer('Moves Created', readonly=True)
+    post_count = fields.Integer('Moves Posted', readonly=True)
+    peak_memory_growth = fields.Integer('Peak Memory Growth (kB)', readonly=True,
+                                        help='How much the run raised the peak resident memory of the server process, 0 when it stayed under an earlier peak.')
+    traced_memory = fields.Integer('Peak Allocated Memory (kB)', readonly=True, help='Peak of the memory allocated during the run, measured when profiling.')
+    breakdown = fields.Text('Breakdown', readonly=True, help='Calls, wall time and queries of the operations measured inside the run.')
+    profile = fields.Binary('Profile', attachment=True, readonly=True, help='cProfile statistics, to open with pstats, snakeviz or flameprof.')
+    profile_filename = fields.Char('Profile Filename', readonly=True)
+
+    @api.model
+    @contextmanager
+    def _track(self, operation, record_count=0):
+        """ Measure the block and log it as a run of ``operation``. The operations measured inside the block are not
+            logged on their own, they are summed up in the breakdown of the outermost run.
+        """
+        runs = _local.__dict__.setdefault('runs', [])
+        thread = threading.current_thread()
+        if not hasattr(thread, 'query_count'):
+            # set by the http and cron threads, counted by the cursors of the thread
+            thread.query_count = 0
+            thread.query_time = 0
+        run = {'create_count': 0, 'post_count': 0, 'breakdown': {}}
+        profiler = None
+        if not runs and str2bool(self.env['ir.config_parameter'].sudo().get_param('ecodrip_perf_log.profile', 'False')):
+            profiler = cProfile.Profile()
+            traced = tracemalloc.is_tracing()
+            if not traced:
+                tracemalloc.start()
+            elif hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+
+        runs.append(run)
+        date_start = fields.Datetime.now()
+        start, query_count, query_time = time.time(), thread.query_count, thread.query_time
+        max_rss = _get_max_rss()
+        error = False
+        if profiler:
+            profiler.enable()
+        try:
+            yield
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            raise
+        finally:
+            if profiler:
+                profiler.disable()
+            runs.pop()
+            run.update(
+                wall_time=time.time() - start,
+                query_count=thread.query_count - query_count,
+                query_time=thread.query_time - query_time,
+            )
+            if runs:
+                breakdown = runs[-1]['breakdown']
+                for name, stats in [(operation, {'calls': 1, 'wall_time': run['wall_time'], 'query_count': run['query_count']})] + list(run['breakdown'].items()):
+                    total = breakdown.setdefault(name, dict.fromkeys(stats, 0))
+                    for key, value in stats.items():
+                        total[key] += value
+            else:
+                vals = {
+                    'operation': operation,
+                    'date_start': date_start,
+                    'user_id': self.env.uid,
+                    'company_id': self.env.company.id,
+                    'record_count': record_count,
+                    'state': 'failed' if error else 'done',
+                    'error': error,
+                    'wall_time': run['wall_time'],
+                    'query_count': run['query_count'],
+                    'query_time': run['query_time'],
+                    'create_count': run['create_count'],
+                    'post_count': run['post_count'],
+                    'peak_memory_growth': _get_max_rss() - max_rss,
+                    'breakdown': run['breakdown'] and json.dumps(run['breakdown'], indent=4),
+                }
+                if profiler:
+                    vals['traced_memory'] = tracemalloc.get_traced_memory()[1] // 1024
+                    if not traced:
+                        tracemalloc.stop()
+                    profiler.create_stats()
+                    # same format as pstats.Stats.dump_stats()
+                    vals['profile'] = base64.b64encode(marshal.dumps(profiler.stats))
+                    vals['profile_filename'] = '%s-%s.prof' % (operation, date_start.strftime('%Y%m%d-%H%M%S'))
+                self._log(vals)
+
+    @api.model
+    def _log(self, vals):
+        if getattr(threading.current_thread(), 'testing', False):
+            # nothing is committed while testing
+            self.sudo().create(vals)
+            return
+        try:
+            # in its own transaction: failed runs are logged even though their transaction is rolled back
+            with self.pool.cursor() as cr:
+                self.with_env(self.env(cr=cr, su=True)).create(vals)
+        except Exception:
+            _logger.exception('Could not log the run of %s', vals['operation'])
+
+    @api.autovacuum
+    def _gc_perf_log(self):
+        max_age = int(self.env['ir.config_parameter'].sudo().get_param('ecodrip_perf_log.max_age', PERF_LOG_MAX_AGE))
+        self.search([('date_start', '<', fields.Datetime.now() - timedelta(days=max_age))]).unlink()
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+
+from odoo import fields, models
+
+
+class ResConfigSettings(models.TransientModel):
+    _inherit = 'res.config.settings'
+
+    ecodrip_perf_profile = fields.Boolean(string='Profile Runs', config_parameter='ecodrip_perf_log.profile',
+                                          help='Attach a cProfile capture to the log of each APR generation and check print.')
@@ -29,12 +29,19 @@ b. Button should appear in “Customer” menu in Accounting application See att
 10. The action should ignore any lock dates set for Journal entries""",
     'license': 'OEEL-1',
     'author': 'Odoo Inc',
-    'version': '1.0',
-    'depends': ['sale_management', 'account_accountant', 'sale_stock', 'base_automation'],
+    'version': '1.1',
+    'depends': ['sale_management', 'account_accountant', 'sale_stock', 'base_automation', 'ecodrip_perf_log'],
+    'external_dependencies': {'python': ['numpy']},
     'data': [
+        'security/ir.model.access.csv',
+        'security/security.xml',
         'data/data.xml',
         'data/actions.xml',
+        'data/ir_cron.xml',
         'views/res_company_views.xml',
-        'views/account_move_views.xml'
+        'views/account_move_views.xml',
+        'views/apr_run_views.xml',
+        'views/apr_projection_views.xml',
+        'views/apr_summary_views.xml',
     ],
 }
@@ -0,0 +1,52 @@
+import logging
+
+_logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50000
+
+
+def migrate(cr, version):
+    """ last_apr_id, x_last_apr_date_due and x_apr_count became stored: create and fill their columns in sql,
+        range of ids by range of ids, so that the ORM does not recompute them for the whole table at once.
+    """
+    if not version:
+        return
+
+    cr.execute("""
+        ALTER TABLE account_move
+            ADD COLUMN IF NOT EXISTS last_apr_id integer,
+            ADD COLUMN IF NOT EXISTS x_last_apr_date_due date,
+            ADD COLUMN IF NOT EXISTS x_apr_count integer
+    """)
+    cr.execute("CREATE INDEX IF NOT EXISTS account_move_x_invoice_id_index ON account_move (x_invoice_id)")
+    # searched by the ORM on every write of invoice_date_due, to recompute x_last_apr_date_due
+    cr.execute("CREATE INDEX IF NOT EXISTS account_move_last_apr_id_index ON account_move (last_apr_id)")
+
+    cr.execute("SELECT MIN(id), MAX(id) FROM account_move")
+    min_id, max_id = cr.fetchone()
+    if min_id is None:
+        return
+    for start in range(min_id, max_id + 1, BATCH_SIZE):
+        # same as _compute_apr_count and _compute_last_apr_id: an invoice without active apr is its own last apr
+        cr.execute("""
+            UPDATE account_move move
+               SET x_apr_count = (SELECT COUNT(*) FROM account_move apr WHERE apr.x_invoice_id = move.id),
+                   last_apr_id = CASE WHEN move.x_invoice_id IS NOT NULL THEN NULL
+                                      ELSE COALESCE((SELECT apr.id
+                                                       FROM account_move apr
+                                                      WHERE apr.x_invoice_id = move.id
+                                                        AND apr.state != 'cancel'
+                                                        AND apr.invoice_date_due IS NOT NULL
+                                                   ORDER BY apr.invoice_date_due DESC, apr.id DESC
+                                                      LIMIT 1), move.id)
+                                 END
+             WHERE move.id >= %(start)s AND move.id < %(stop)s
+        """, {'start': start, 'stop': start + BATCH_SIZE})
+        cr.execute("""
+            UPDATE account_move move
+               SET x_last_apr_date_due = last_apr.invoice_date_due
+              FROM account_move last_apr
+             WHERE last_apr.id = move.last_apr_id
+               AND move.id >= %(start)s AND move.id < %(stop)s
+        """, {'start': start, 'stop': start + BATCH_SIZE})
+        _logger.info('APR fields backfilled up to account.move %s / %s', min(start + BATCH_SIZE - 1, max_id), max_id)
@@ -1,3 +1,8 @@
 from . import account_move
 from . import sale_order
 from . import res_company
+from . import apr_sequence
+from . import apr_run
+from . import apr_projection
+from . import apr_summary
+from . import account_partial_reconcile
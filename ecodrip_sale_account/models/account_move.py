@@ -1,18 +1,64 @@
 from odoo import fields, models, api, _
 from odoo.exceptions import UserError, ValidationError
 import datetime, dateutil
-import re
+import logging
+
+from odoo.tools import split_every
+from odoo.addons.ecodrip_perf_log.models.perf_log import tracked
+
+_logger = logging.getLogger(__name__)
+
+APR_ANNUAL_RATE = 0.18
+APR_CREATE_BATCH_SIZE = 500
+# first key of the advisory locks taken on the source invoices while their aprs are generated
+APR_ADVISORY_LOCK_KEY = 1825668
 
 
 class AccountMove(models.Model):
     _inherit = 'account.move'
 
     # migrate some of the fields from data files here
-    x_invoice_id = fields.Many2one('account.move', ondelete='set null', string='Main Invoice', readonly=False)
+    x_invoice_id = fields.Many2one('account.move', ondelete='set null', string='Main Invoice', readonly=False, index=True)
     x_apr_ids = fields.One2many('account.move', 'x_invoice_id', string='Related APRs', readonly=True)
-    x_apr_count = fields.Integer('# of APRs', readonly=True, compute="_compute_apr_count")
-    last_apr_id = fields.Many2one('account.move', ondelete='set null', string='Last APR', readonly=True, compute='_compute_last_apr_id')
-    x_last_apr_date_due = fields.Date('Last APR Date Due', related='last_apr_id.invoice_date_due', readonly=True)
+    # stored so that the apr backlog can be searched in sql, see migrations/1.1 for the backfill
+    x_apr_count = fields.Integer('# of APRs', readonly=True, compute="_compute_apr_count", store=True)
+    last_apr_id = fields.Many2one('account.move', ondelete='set null', string='Last APR', readonly=True, compute='_compute_last_apr_id', store=True, index=True)
+    x_last_apr_date_due = fields.Date('Last APR Date Due', related='last_apr_id.invoice_date_due', readonly=True, store=True)
+    # source invoice and period end of an apr, there can only be one active apr per invoice and month
+    x_apr_key = fields.Char('APR Key', readonly=True, copy=False)
+
+    def init(self):
+        super(AccountMove, self).init()
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS account_move_x_apr_key_uniq
+                ON account_move (x_apr_key)
+             WHERE x_apr_key IS NOT NULL AND state != 'cancel'
+        """)
+        # apr backlog, see _get_apr_backlog_domain
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS account_move_x_apr_backlog_index
+                ON account_move (move_type, state, payment_state, x_invoice_id, x_last_apr_date_due)
+        """)
+
+    def _post(self, soft=True):
+        posted = super(AccountMove, self)._post(soft)
+        posted._refresh_apr_summary()
+        return posted
+
+    def button_draft(self):
+        res = super(AccountMove, self).button_draft()
+        self._refresh_apr_summary()
+        return res
+
+    def button_cancel(self):
+        res = super(AccountMove, self).button_cancel()
+        self._refresh_apr_summary()
+        return res
+
+    def _refresh_apr_summary(self):
+        aprs = self.filtered('x_invoice_id')
+        if aprs:
+            self.env['ecodrip.apr.summary'].sudo()._refresh(aprs)
 
     def _get_last_sequence(self, relaxed=False, lock=True):
         result = super(AccountMove, self)._get_last_sequence(relaxed, lock)
@@ -22,6 +68,7 @@ class AccountMove(models.Model):
                 result = result.split('-')[0]
         return result
     
+    @api.depends('x_apr_ids')
     def _compute_apr_count(self):
         for inv in self:
             inv.x_apr_count = len(inv.x_apr_ids)
@@ -41,7 +88,7 @@ class AccountMove(models.Model):
 
         return action_data
     
-    @api.depends('x_apr_ids', 'x_apr_ids.state', 'x_apr_ids.invoice_date_due')
+    @api.depends('x_invoice_id', 'x_apr_ids', 'x_apr_ids.state', 'x_apr_ids.invoice_date_due')
     def _compute_last_apr_id(self):
         for record in self:
             if not record.x_invoice_id:
@@ -60,10 +107,15 @@ class AccountMove(models.Model):
         if not date:
             date = datetime.date.today()
             
-        invoices = self.env['account.move'].search([('move_type', '=', 'out_invoice'), ('state', '=', 'posted'), ('payment_state', 'in', ['not_paid', 'in_payment', 'partial']), ('x_invoice_id', '=', False), ('x_last_apr_date_due', '!=', False), ('x_last_apr_date_due', '<', date)], limit=batch_size)
+        invoices = self.env['account.move'].search(self._get_apr_backlog_domain(date), limit=batch_size)
 
         invoices.generate_apr(date=date, safe=True)
+
+    @api.model
+    def _get_apr_backlog_domain(self, date):
+        return [('move_type', '=', 'out_invoice'), ('state', '=', 'posted'), ('payment_state', 'in', ['not_paid', 'in_payment', 'partial']), ('x_invoice_id', '=', False), ('x_last_apr_date_due', '!=', False), ('x_last_apr_date_due', '<', date)]
     
+    @tracked('generate_apr')
     def generate_apr(self, date=None, safe=False):
         if not date:
             date = datetime.date.today()
@@ -76,46 +128,91 @@ class AccountMove(models.Model):
         if not invoices:
             raise ValidationError(_('No open, past due invoices or aprs.'))
 
-        for inv in invoices:
+        # another run may be working on some of these invoices right now, leave them to it
+        locked_invoices = invoices._lock_for_apr()
+        if locked_invoices != invoices:
+            _logger.info('Skipping APR generation of invoices %s, they are being processed by another run.', (invoices - locked_invoices).ids)
+        invoices = locked_invoices
+
+        # work out every missing apr in memory first, then create and validate them in batches
+        schedule = invoices._prepare_apr_schedule(date)
+        invoices._assign_apr_names(schedule)
+
+        aprs = self.env['account.move']
+        for batch in split_every(APR_CREATE_BATCH_SIZE, [vals for inv, vals in schedule]):
+            new_apr_ids = self.env['account.move'].create(list(batch))
+            # validate invoices
+            new_apr_ids.action_post()
+            aprs |= new_apr_ids
+        return aprs
+
+    def _lock_for_apr(self):
+        # transaction level advisory lock per source invoice, released when the aprs are committed
+        self.env.cr.execute("SELECT id FROM unnest(%s) AS id WHERE pg_try_advisory_xact_lock(%s, id)", [self.ids, APR_ADVISORY_LOCK_KEY])
+        locked_ids = {row[0] for row in self.env.cr.fetchall()}
+        return self.filtered(lambda inv: inv.id in locked_ids)
+
+    def _prepare_apr_schedule(self, date):
+        """ Compute the values of all the APRs missing up to ``date`` without creating anything.
+            Returns a list of (invoice, values) in the order the APRs have to be created.
+        """
+        schedule = []
+        for inv in self:
+            company = inv.company_id
             # since customer is using multi company, we need to make sure apr related settings exist in current invoice company
-            if not inv.company_id.x_apr_payment_term_id or not inv.company_id.x_apr_product_id or (not inv.company_id.x_apr_account_id and not inv.company_id.x_apr_product_id.property_account_income_id):
-                raise ValidationError(_('APR product or payment term or account is not set for company: {}.'.format(inv.company_id.display_name)))
-    
+            if not company._has_apr_settings():
+                raise ValidationError(_('APR product or payment term or account is not set for company: {}.'.format(company.display_name)))
+
             # find the last active invoice, it could be the invoice itself or the last apr of this invoice
             last_apr_id = inv.last_apr_id or inv
+            date_due = last_apr_id.invoice_date_due
+            first_day = last_apr_id.invoice_date_due if last_apr_id == inv else last_apr_id.invoice_date  # technical first day
 
             # we want to create all missing APRs, based on the date this action is being run
-            while last_apr_id.invoice_date_due < date:
-                # create a new apr with the invoice_date setting to the end of the same month of the current due date
-                first_day = last_apr_id.invoice_date_due if last_apr_id == inv else last_apr_id.invoice_date  # technical first day
-                
-                #Resequence APR Invoices
-                last_sequence = inv._get_last_sequence()
-                last_sequence_number = re.match('.*?([0-9]+)$', last_sequence).group(1)
-                new_sequence_number = int(last_sequence_number) + 1
-                if self.env['account.move'].search([('sequence_prefix', 'like', inv.sequence_prefix), ('sequence_number', '=', new_sequence_number)]):
-                    new_sequence_number += 1
-                new_sequence = last_sequence[::-1].replace(last_sequence_number[::-1], '', 1)[::-1] + '{:04d}'.format(new_sequence_number)
-                #Create APR Invoice
-                new_apr_id = self.env['account.move'].create({
-                    'name': '{}-{}/APR/{:03d}'.format(new_sequence, inv.name, len(inv.x_apr_ids)+1),
-                    'company_id': inv.company_id.id,
+            while date_due < date:
+                # the apr invoice_date is the end of the same month of the current due date
+                invoice_date = self.last_day_of_month(date_due)
+                schedule.append((inv, {
+                    'company_id': company.id,
                     'partner_id': inv.partner_id.id,
                     'move_type': 'out_invoice',
                     'x_invoice_id': inv.id,
-                    'invoice_payment_term_id': inv.company_id.x_apr_payment_term_id.id,
-                    'invoice_date': self.last_day_of_month(last_apr_id.invoice_date_due),
+                    'x_apr_key': '{}-{}'.format(inv.id, invoice_date),
+                    'invoice_payment_term_id': company.x_apr_payment_term_id.id,
+                    'invoice_date': invoice_date,
                     'invoice_line_ids': [(0,0,{
-                    'product_id': inv.company_id.x_apr_product_id.id,
-                    'price_unit': inv.amount_residual * ((self.last_day_of_month(last_apr_id.invoice_date_due) - first_day).days/365.0*0.18),
+                    'product_id': company.x_apr_product_id.id,
+                    'price_unit': inv.amount_residual * ((invoice_date - first_day).days/365.0*APR_ANNUAL_RATE),
                     'quantity': 1.00,
-                    'name': inv.company_id.x_apr_product_id.description_sale or 'Finance Charges',
-                    'account_id': inv.company_id.x_apr_product_id.property_account_income_id.id or inv.company_id.x_apr_account_id.id
+                    'name': company.x_apr_product_id.description_sale or 'Finance Charges',
+                    'account_id': company.x_apr_product_id.property_account_income_id.id or company.x_apr_account_id.id
                     })],
-                })
+                }))
                 # this is to show to human since the real first day is one day before
                 # display_first_day = first_day + dateutil.relativedelta.relativedelta(days=+1)
-                # validate invoice
-                new_apr_id.action_post()
-                # loop on
-                last_apr_id = new_apr_id
+                # loop on, the next apr starts where this one ends
+                first_day = invoice_date
+                date_due = inv._get_apr_date_due(company.x_apr_payment_term_id, invoice_date)
+        return schedule
+
+    def _get_apr_date_due(self, payment_term, invoice_date):
+        # same due date as the one the payment term will set on the apr once created
+        terms = payment_term.compute(1.0, date_ref=invoice_date, currency=self.company_id.currency_id)
+        return max(fields.Date.to_date(term_date) for term_date, amount in terms)
+
+    def _assign_apr_names(self, schedule):
+        # Resequence APR Invoices: reserve one block of numbers per journal/prefix for the whole batch
+        blocks = {}
+        for inv, vals in schedule:
+            key = (inv.journal_id, inv.sequence_prefix)
+            blocks[key] = blocks.get(key, 0) + 1
+        for (journal, prefix), count in blocks.items():
+            blocks[(journal, prefix)] = self.env['ecodrip.apr.sequence']._reserve(journal, prefix, count)
+
+        apr_numbers = {}
+        for inv, vals in schedule:
+            key = (inv.journal_id, inv.sequence_prefix)
+            new_sequence_number = blocks[key]
+            blocks[key] += 1
+            apr_numbers[inv] = apr_numbers.get(inv, len(inv.x_apr_ids)) + 1
+            vals['name'] = '{}{:04d}-{}/APR/{:03d}'.format(inv.sequence_prefix, new_sequence_number, inv.name, apr_numbers[inv])
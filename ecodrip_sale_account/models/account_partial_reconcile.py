@@ -0,0 +1,17 @@
+from odoo import fields, models, api, _
+
+
+class AccountPartialReconcile(models.Model):
+    _inherit = 'account.partial.reconcile'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        partials = super(AccountPartialReconcile, self).create(vals_list)
+        (partials.debit_move_id.move_id | partials.credit_move_id.move_id)._refresh_apr_summary()
+        return partials
+
+    def unlink(self):
+        moves = self.debit_move_id.move_id | self.credit_move_id.move_id
+        res = super(AccountPartialReconcile, self).unlink()
+        moves.exists()._refresh_apr_summary()
+        return res
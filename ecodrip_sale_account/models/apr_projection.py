@@ -0,0 +1,171 @@
+import datetime
+import logging
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import fields, models, api, _
+from odoo.exceptions import UserError
+
+from .account_move import APR_ANNUAL_RATE
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+except ImportError:
+    _logger.debug('Cannot import numpy, the APR projection is not available.')
+    np = None
+
+
+def month_end(dates):
+    return (dates.astype('datetime64[M]') + 1).astype('datetime64[D]') - 1
+
+
+def project_finance_charges(residual, date_due, first_day, term_index, horizon, term_due_dates):
+    """ Vectorized version of the loop of AccountMove._prepare_apr_schedule, for all the invoices at once.
+
+        :param residual: amount residual of each invoice (float array)
+        :param date_due: due date of the last apr of each invoice, or of the invoice itself (datetime64[D] array)
+        :param first_day: first day charged by the next apr of each invoice (datetime64[D] array)
+        :param term_index: index of the apr payment term of each invoice (int array)
+        :param horizon: aprs are projected as generate_apr(date=horizon) would create them (datetime64[D])
+        :param term_due_dates: function(term indexes, invoice dates) returning the due dates the terms give
+        :return: (invoice indexes, apr invoice dates, apr amounts) arrays, one entry per projected apr
+    """
+    date_due = date_due.copy()
+    first_day = first_day.copy()
+    rows, periods, amounts = [], [], []
+    active = np.flatnonzero(date_due < horizon)
+    # one iteration per month, for all the invoices still running late at once
+    while active.size:
+        invoice_date = month_end(date_due[active])
+        days = (invoice_date - first_day[active]).astype(np.int64)
+        rows.append(active)
+        periods.append(invoice_date)
+        amounts.append(residual[active] * (days / 365.0 * APR_ANNUAL_RATE))
+        first_day[active] = invoice_date
+        date_due[active] = term_due_dates(term_index[active], invoice_date)
+        active = active[date_due[active] < horizon]
+    if not rows:
+        return np.array([], dtype=np.int64), np.array([], dtype='datetime64[D]'), np.array([], dtype=np.float64)
+    return np.concatenate(rows), np.concatenate(periods), np.concatenate(amounts)
+
+
+class AprProjection(models.TransientModel):
+    _name = 'ecodrip.apr.projection'
+    _description = 'APR Projection'
+
+    months = fields.Selection([('6', '6 Months'), ('12', '12 Months')], string='Period', required=True, default='6')
+    date = fields.Date('From', required=True, default=fields.Date.context_today)
+    company_ids = fields.Many2many('res.company', string='Companies', required=True, default=lambda self: self.env.companies)
+    line_ids = fields.One2many('ecodrip.apr.projection.line', 'projection_id', string='Projected Charges')
+
+    def action_compute(self):
+        self.ensure_one()
+        if np is None:
+            raise UserError(_('The APR projection needs the numpy python library.'))
+        self.line_ids.unlink()
+        invoice_ids, partner_ids, company_ids, periods, amounts = self._project(self.date + relativedelta(months=int(self.months)))
+
+        # one line per partner, company and month
+        keys = np.stack([partner_ids, company_ids, periods.astype('datetime64[M]').astype(np.int64)])
+        if keys.shape[1]:
+            keys, inverse = np.unique(keys, axis=1, return_inverse=True)
+            totals = np.bincount(inverse.ravel(), weights=amounts, minlength=keys.shape[1])
+            counts = np.bincount(inverse.ravel(), minlength=keys.shape[1])
+            months = keys[2].astype('datetime64[M]').astype('datetime64[D]')
+            self.env.cr.execute("""
+                INSERT INTO ecodrip_apr_projection_line
+                            (projection_id, partner_id, company_id, date, amount, apr_count, create_uid, create_date, write_uid, write_date)
+                     SELECT %(projection_id)s, unnest(%(partner_ids)s::int[]), unnest(%(company_ids)s::int[]), unnest(%(dates)s::date[]),
+                            unnest(%(amounts)s::float8[]), unnest(%(counts)s::int[]), %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+            """, {
+                'projection_id': self.id,
+                'partner_ids': keys[0].tolist(),
+                'company_ids': keys[1].tolist(),
+                'dates': [str(month) for month in months],
+                'amounts': totals.tolist(),
+                'counts': counts.tolist(),
+                'uid': self.env.uid,
+            })
+            self.invalidate_cache(['line_ids'])
+
+        action = self.env.ref('ecodrip_sale_account.x_action_apr_projection_line_ecodrip').read()[0]
+        action['domain'] = [('projection_id', '=', self.id)]
+        return action
+
+    def _project(self, horizon):
+        """ Project the aprs of all the open invoices of the companies up to ``horizon``, without touching the ORM.
+            Returns (invoice ids, partner ids, company ids, apr invoice dates, apr amounts) arrays, one entry per apr.
+        """
+        companies = self.company_ids.filtered(lambda company: company._has_apr_settings())
+        if not companies:
+            raise UserError(_('APR product or payment term or account is not set for the selected companies.'))
+
+        self.env['account.move'].flush(['move_type', 'state', 'payment_state', 'x_invoice_id', 'last_apr_id', 'amount_residual', 'invoice_date', 'invoice_date_due', 'partner_id', 'company_id'])
+        self.env.cr.execute("""
+            SELECT move.id, move.partner_id, move.company_id, company.x_apr_payment_term_id, move.amount_residual,
+                   last_apr.invoice_date_due,
+                   CASE WHEN last_apr.id = move.id THEN last_apr.invoice_date_due ELSE last_apr.invoice_date END
+              FROM account_move move
+              JOIN account_move last_apr ON last_apr.id = move.last_apr_id
+              JOIN res_company company ON company.id = move.company_id
+             WHERE move.move_type = 'out_invoice'
+               AND move.state = 'posted'
+               AND move.payment_state IN ('not_paid', 'in_payment', 'partial')
+               AND move.x_invoice_id IS NULL
+               AND last_apr.invoice_date_due IS NOT NULL
+               AND move.company_id IN %s
+        """, [tuple(companies.ids)])
+        rows = self.env.cr.fetchall()
+        if not rows:
+            empty = np.array([], dtype=np.int64)
+            return empty, empty, empty, np.array([], dtype='datetime64[D]'), np.array([], dtype=np.float64)
+
+        invoice_ids, partner_ids, company_ids, term_ids, residual, date_due, first_day = zip(*rows)
+        terms, term_index = np.unique(np.array(term_ids, dtype=np.int64), return_inverse=True)
+        term_due_dates = self._get_term_due_dates_function(self.env['account.payment.term'].browse(terms.tolist()))
+        rows, periods, amounts = project_finance_charges(
+            np.array(residual, dtype=np.float64),
+            np.array(date_due, dtype='datetime64[D]'),
+            np.array(first_day, dtype='datetime64[D]'),
+            term_index,
+            np.datetime64(horizon, 'D'),
+            term_due_dates,
+        )
+        return (
+            np.array(invoice_ids, dtype=np.int64)[rows],
+            np.array(partner_ids, dtype=np.int64)[rows],
+            np.array(company_ids, dtype=np.int64)[rows],
+            periods,
+            amounts,
+        )
+
+    def _get_term_due_dates_function(self, terms):
+        # the aprs are dated at month ends: only a few (term, date) pairs are ever computed by the payment terms
+        Move = self.env['account.move']
+        due_dates = {}
+
+        def term_due_dates(term_index, invoice_dates):
+            pairs, inverse = np.unique(np.stack([term_index, invoice_dates.astype(np.int64)]), axis=1, return_inverse=True)
+            result = np.empty(pairs.shape[1], dtype='datetime64[D]')
+            for i, (index, invoice_date) in enumerate(pairs.T.tolist()):
+                if (index, invoice_date) not in due_dates:
+                    date = datetime.date(1970, 1, 1) + datetime.timedelta(days=invoice_date)
+                    due_dates[(index, invoice_date)] = Move._get_apr_date_due(terms[index], date)
+                result[i] = due_dates[(index, invoice_date)]
+            return result[inverse.ravel()]
+        return term_due_dates
+
+
+class AprProjectionLine(models.TransientModel):
+    _name = 'ecodrip.apr.projection.line'
+    _description = 'APR Projection Line'
+    _order = 'date, partner_id'
+
+    projection_id = fields.Many2one('ecodrip.apr.projection', string='Projection', required=True, ondelete='cascade')
+    partner_id = fields.Many2one('res.partner', string='Customer', readonly=True)
+    company_id = fields.Many2one('res.company', string='Company', readonly=True)
+    date = fields.Date('Month', readonly=True)
+    amount = fields.Float('Finance Charges', readonly=True)
+    apr_count = fields.Integer('# of APRs', readonly=True)
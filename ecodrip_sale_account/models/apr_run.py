@@ -0,0 +1,229 @@
+import calendar
+import logging
+import random
+import threading
+import time
+
+from psycopg2 import OperationalError
+
+from odoo import fields, models, api, _
+from odoo.service.model import PG_CONCURRENCY_ERRORS_TO_RETRY, MAX_TRIES_ON_CONCURRENCY_FAILURE
+
+_logger = logging.getLogger(__name__)
+
+APR_RUN_CHUNK_SIZE = 200
+APR_RUN_DAY = 0  # day of the month the cron starts the monthly run, 0 for the last day
+
+
+def _is_concurrency_error(error):
+    return isinstance(error, OperationalError) and error.pgcode in PG_CONCURRENCY_ERRORS_TO_RETRY
+
+
+class AprRun(models.Model):
+    _name = 'ecodrip.apr.run'
+    _description = 'APR Run'
+    _order = 'id desc'
+    _rec_name = 'date'
+
+    date = fields.Date('Target Date', required=True, readonly=True, default=fields.Date.context_today)
+    state = fields.Selection([('running', 'Running'), ('done', 'Done')], string='Status', required=True, readonly=True, default='running')
+    origin = fields.Selection([('manual', 'Manual'), ('cron', 'Scheduled')], string='Started By', required=True, readonly=True, default='manual')
+    shard_count = fields.Integer('Workers', required=True, readonly=True, default=1)
+    shard_ids = fields.One2many('ecodrip.apr.run.shard', 'run_id', string='Shards', readonly=True)
+    # the shards update their own counters concurrently, the run only sums them up
+    processed_count = fields.Integer('Processed Invoices', compute='_compute_counts')
+    failed_count = fields.Integer('Failed Invoices', compute='_compute_counts')
+    date_done = fields.Datetime('Finished On', readonly=True)
+    error_ids = fields.One2many('ecodrip.apr.run.error', 'run_id', string='Errors', readonly=True)
+
+    @api.depends('shard_ids.processed_count', 'shard_ids.failed_count')
+    def _compute_counts(self):
+        for run in self:
+            run.processed_count = sum(run.shard_ids.mapped('processed_count'))
+            run.failed_count = sum(run.shard_ids.mapped('failed_count'))
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        # the backlog is split by journal and sequence prefix between as many shards as there are workers
+        shard_count = max(1, int(self.env['ir.config_parameter'].sudo().get_param('ecodrip_sale_account.apr_run_workers', 1)))
+        for vals in vals_list:
+            vals.setdefault('shard_count', shard_count)
+            vals.setdefault('shard_ids', [(0, 0, {'index': index}) for index in range(vals['shard_count'])])
+        return super(AprRun, self).create(vals_list)
+
+    @api.model
+    def action_start(self):
+        # start a run for today, unless one is already going on, and let the cron do the work
+        run = self.search([('state', '=', 'running')], limit=1) or self.create({})
+        self.env.ref('ecodrip_sale_account.x_cron_run_apr_ecodrip')._trigger()
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': run.id,
+            'view_mode': 'form',
+        }
+
+    @api.model
+    def _cron_run_apr(self):
+        # resume the unfinished run if any (crash, timeout), otherwise start the scheduled run of the month once, on its
+        # day: an apr charges interest up to the end of its month, it must not be created for an invoice paid by then.
+        # The runs started from the menu in the meantime do not replace it.
+        run = self.search([('state', '=', 'running')], order='id', limit=1)
+        if not run:
+            today = fields.Date.context_today(self)
+            if today >= self._get_run_day(today) and not self.search_count([('origin', '=', 'cron'), ('date', '>=', today.replace(day=1))]):
+                run = self.create({'date': today, 'origin': 'cron'})
+        if run:
+            run._process()
+
+    @api.model
+    def _get_run_day(self, date):
+        # the day of the month of ``date`` set in ecodrip_sale_account.apr_run_day, the last day by default
+        day = int(self.env['ir.config_parameter'].sudo().get_param('ecodrip_sale_account.apr_run_day', APR_RUN_DAY))
+        last_day = calendar.monthrange(date.year, date.month)[1]
+        return date.replace(day=min(day, last_day) if day > 0 else last_day)
+
+    def unlink(self):
+        self.shard_ids.cron_id.sudo().unlink()
+        return super(AprRun, self).unlink()
+
+    def _process(self):
+        self.ensure_one()
+        shards = self.shard_ids.filtered(lambda shard: shard.state == 'running')
+        if getattr(threading.current_thread(), 'testing', False):
+            for shard in shards:
+                shard._process()
+        else:
+            # every shard is a job of its own, run by any free cron worker in its own transaction, with its own time
+            # and memory limits. A shard that crashed is resumed by the next call of its job.
+            for shard in shards.filtered(lambda shard: not shard.cron_id):
+                shard.cron_id = self.env['ir.cron'].sudo().create(shard._prepare_cron_values())
+                shard.cron_id._trigger()
+        if all(shard.state == 'done' for shard in self.shard_ids):
+            self.shard_ids.cron_id.sudo().unlink()
+            self.write({'state': 'done', 'date_done': fields.Datetime.now()})
+
+
+class AprRunShard(models.Model):
+    _name = 'ecodrip.apr.run.shard'
+    _description = 'APR Run Shard'
+    _order = 'run_id, index'
+
+    run_id = fields.Many2one('ecodrip.apr.run', string='Run', required=True, ondelete='cascade')
+    index = fields.Integer('Index', required=True)
+    state = fields.Selection([('running', 'Running'), ('done', 'Done')], string='Status', required=True, default='running')
+    cursor = fields.Integer('Cursor', help='Last invoice processed, the shard resumes after it.')
+    processed_count = fields.Integer('Processed Invoices')
+    failed_count = fields.Integer('Failed Invoices')
+    cron_id = fields.Many2one('ir.cron', string='Scheduled Action', readonly=True, ondelete='set null')
+
+    def _prepare_cron_values(self):
+        self.ensure_one()
+        return {
+            'name': 'APR: Generate finance charges, run %s shard %s' % (self.run_id.id, self.index),
+            'model_id': self.env['ir.model']._get_id(self._name),
+            'state': 'code',
+            'code': 'model.browse(%d)._cron_process()' % self.id,
+            'user_id': self.env.ref('base.user_root').id,
+            'interval_number': 1,
+            'interval_type': 'hours',
+            'numbercall': -1,
+            'doall': False,
+        }
+
+    def _cron_process(self):
+        shard = self.exists()
+        if shard.state == 'running':
+            shard._process()
+            # the run cron closes the run and drops the shard jobs once they are all done
+            self.env.ref('ecodrip_sale_account.x_cron_run_apr_ecodrip')._trigger()
+
+    def _process(self):
+        self.ensure_one()
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        chunk_size = int(self.env['ir.config_parameter'].sudo().get_param('ecodrip_sale_account.apr_run_chunk_size', APR_RUN_CHUNK_SIZE))
+        tries = 0
+        while True:
+            invoices = self._get_next_chunk(chunk_size)
+            if not invoices:
+                break
+            try:
+                errors = self._process_chunk(invoices)
+            except OperationalError as e:
+                # another run got there first: replay the chunk in a new transaction, on a fresh snapshot
+                if not _is_concurrency_error(e) or not auto_commit or tries >= MAX_TRIES_ON_CONCURRENCY_FAILURE:
+                    raise
+                tries += 1
+                _logger.info('APR run shard %s: concurrent update, retrying the chunk (%s/%s)', self.id, tries, MAX_TRIES_ON_CONCURRENCY_FAILURE)
+                self.env.cr.rollback()
+                self.env.clear()
+                time.sleep(random.uniform(0.0, 2 ** tries))
+                continue
+            tries = 0
+            self.write({
+                'cursor': invoices[-1].id,
+                'processed_count': self.processed_count + len(invoices) - len(errors),
+                'failed_count': self.failed_count + len(errors),
+            })
+            self.env['ecodrip.apr.run.error'].create([dict(error, run_id=self.run_id.id) for error in errors])
+            # everything up to the cursor is saved, a crash from now on only replays the next chunk
+            if auto_commit:
+                self.env.cr.commit()
+        self.state = 'done'
+
+    def _get_next_chunk(self, chunk_size):
+        # all the invoices of a journal and sequence prefix belong to the same shard, so that the shards never
+        # reserve APR numbers on the same ecodrip.apr.sequence row, see _assign_apr_names()
+        Move = self.env['account.move']
+        query = Move._where_calc(Move._get_apr_backlog_domain(self.run_id.date) + [('id', '>', self.cursor)])
+        Move._apply_ir_rules(query, 'read')
+        query.add_where('mod(abs(hashtext("account_move".journal_id || \'/\' || COALESCE("account_move".sequence_prefix, \'\'))::bigint), %s) = %s', [self.run_id.shard_count, self.index])
+        query.order = '"account_move".id'
+        query.limit = chunk_size
+        self.env.cr.execute(*query.select('"account_move".id'))
+        return Move.browse([row[0] for row in self.env.cr.fetchall()])
+
+    def _process_chunk(self, invoices):
+        """ Generate the APRs of a chunk of invoices and return the values of the errors to log.
+            Invoices of misconfigured companies are skipped, and a failing invoice only rolls back itself. Concurrency
+            errors are raised: the snapshot of the transaction is stale, replaying the invoices in it would fail again.
+        """
+        errors = []
+        misconfigured = invoices.filtered(lambda inv: not inv.company_id._has_apr_settings())
+        for inv in misconfigured:
+            errors.append({'invoice_id': inv.id, 'message': _('APR product or payment term or account is not set for company: {}.').format(inv.company_id.display_name)})
+
+        todo = invoices - misconfigured
+        if not todo:
+            return errors
+        date = self.run_id.date
+        try:
+            with self.env.cr.savepoint():
+                todo.generate_apr(date=date, safe=True)
+        except Exception as e:
+            if _is_concurrency_error(e):
+                raise
+            self.env.clear()
+            # redo the chunk invoice per invoice to find the culprits
+            for inv in todo:
+                try:
+                    with self.env.cr.savepoint():
+                        inv.generate_apr(date=date, safe=True)
+                except Exception as e:
+                    if _is_concurrency_error(e):
+                        raise
+                    self.env.clear()
+                    _logger.warning('APR generation failed for invoice %s', inv.id, exc_info=True)
+                    errors.append({'invoice_id': inv.id, 'message': str(e)})
+        return errors
+
+
+class AprRunError(models.Model):
+    _name = 'ecodrip.apr.run.error'
+    _description = 'APR Run Error'
+    _order = 'id'
+
+    run_id = fields.Many2one('ecodrip.apr.run', string='Run', required=True, ondelete='cascade')
+    invoice_id = fields.Many2one('account.move', string='Invoice', ondelete='cascade')
+    company_id = fields.Many2one('res.company', string='Company', related='invoice_id.company_id', store=True)
+    message = fields.Text('Error')
@@ -0,0 +1,46 @@
+import re
+
+from odoo import fields, models, api, _
+
+
+class AprSequence(models.Model):
+    _name = 'ecodrip.apr.sequence'
+    _description = 'APR Sequence Reservation'
+    _log_access = False
+
+    journal_id = fields.Many2one('account.journal', string='Journal', required=True, ondelete='cascade')
+    prefix = fields.Char('Prefix', required=True)
+    number_next = fields.Integer('Next Number', required=True, default=1)
+
+    _sql_constraints = [
+        ('journal_prefix_uniq', 'unique(journal_id, prefix)', 'There can only be one APR sequence per journal and prefix.'),
+    ]
+
+    @api.model
+    def _reserve(self, journal, prefix, count):
+        """ Reserve a block of ``count`` consecutive numbers for ``prefix`` in ``journal`` and return the first one.
+
+            The counter row is created or bumped in a single statement, never below the highest number already used
+            by a move of the journal (APR names start with the sequence they were given), so regular invoices numbered
+            in between are skipped. The row stays locked until the end of the transaction: a concurrent run waits for
+            it and then fails to serialize instead of handing out the same numbers (the APR run shards retry the chunk),
+            and a rollback releases the block without leaving a gap.
+        """
+        self.flush()
+        self.env.cr.execute("""
+            INSERT INTO ecodrip_apr_sequence (journal_id, prefix, number_next)
+                 SELECT %(journal_id)s, %(prefix)s, COALESCE(MAX(SUBSTRING(name FROM %(regex)s)::integer), 0) + 1 + %(count)s
+                   FROM account_move
+                  WHERE journal_id = %(journal_id)s
+                    AND name LIKE %(like)s
+            ON CONFLICT (journal_id, prefix) DO UPDATE
+                    SET number_next = GREATEST(ecodrip_apr_sequence.number_next, EXCLUDED.number_next - %(count)s) + %(count)s
+              RETURNING number_next - %(count)s
+        """, {
+            'journal_id': journal.id,
+            'prefix': prefix,
+            'count': count,
+            'regex': '^%s([0-9]+)(-|$)' % re.sub(r'([.^$*+?()\[\]{}|\\])', r'\\\1', prefix),
+            'like': '%s%%' % re.sub(r'([%_\\])', r'\\\1', prefix),
+        })
+        return self.env.cr.fetchone()[0]
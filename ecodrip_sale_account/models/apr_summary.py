@@ -0,0 +1,107 @@
+from odoo import fields, models, api, _
+
+
+class AprSummary(models.Model):
+    """ Posted APRs summed up per customer, company and month, kept up to date as the APRs are posted, cancelled or
+        paid. Meant to be read by the partner ledger and aged receivable reports instead of the APR moves themselves.
+    """
+    _name = 'ecodrip.apr.summary'
+    _description = 'APR Monthly Summary'
+    _order = 'date desc, partner_id'
+    _log_access = False
+
+    partner_id = fields.Many2one('res.partner', string='Customer', required=True, readonly=True, index=True, ondelete='cascade')
+    company_id = fields.Many2one('res.company', string='Company', required=True, readonly=True, ondelete='cascade')
+    currency_id = fields.Many2one('res.currency', related='company_id.currency_id')
+    date = fields.Date('Month', required=True, readonly=True)
+    apr_count = fields.Integer('# of APRs', readonly=True)
+    invoiced_amount = fields.Monetary('Invoiced', readonly=True)
+    paid_amount = fields.Monetary('Paid', readonly=True)
+    residual_amount = fields.Monetary('Outstanding', readonly=True)
+
+    _sql_constraints = [
+        ('partner_company_date_uniq', 'unique(partner_id, company_id, date)', 'There is only one APR summary per customer, company and month.'),
+    ]
+
+    # same expressions for the refresh and the rebuild
+    _select = """
+        SELECT move.commercial_partner_id, move.company_id, date_trunc('month', move.invoice_date)::date,
+               COUNT(*), SUM(move.amount_total_signed),
+               SUM(move.amount_total_signed - move.amount_residual_signed), SUM(move.amount_residual_signed)
+          FROM account_move move
+         WHERE move.x_invoice_id IS NOT NULL
+           AND move.state = 'posted'
+           AND move.commercial_partner_id IS NOT NULL
+           AND move.invoice_date IS NOT NULL
+    """
+    _insert = """
+        INSERT INTO ecodrip_apr_summary (partner_id, company_id, date, apr_count, invoiced_amount, paid_amount, residual_amount)
+    """
+
+    def init(self):
+        self.env.cr.execute("SELECT 1 FROM ecodrip_apr_summary LIMIT 1")
+        if not self.env.cr.fetchone():
+            self._rebuild()
+
+    def _flush_aprs(self):
+        self.env['account.move'].flush(['x_invoice_id', 'state', 'commercial_partner_id', 'company_id', 'invoice_date', 'amount_total_signed', 'amount_residual_signed'])
+
+    @api.model
+    def _rebuild(self):
+        self._flush_aprs()
+        self.env.cr.execute("DELETE FROM ecodrip_apr_summary")
+        self.env.cr.execute(self._insert + self._select + " GROUP BY 1, 2, 3")
+        self.invalidate_cache()
+
+    @api.model
+    def _refresh(self, aprs):
+        """ Recompute the rows of the customers, companies and months of ``aprs``. The rows are upserted rather than
+            deleted and inserted again: the transactions posting aprs of the same customer and month at the same time
+            then fail on a serialization error, which is retried, instead of a unique violation.
+        """
+        keys = {(apr.commercial_partner_id.id, apr.company_id.id, apr.invoice_date.replace(day=1))
+                for apr in aprs if apr.commercial_partner_id and apr.invoice_date}
+        if not keys:
+            return
+        self._flush_aprs()
+        partner_ids, company_ids, dates = zip(*keys)
+        params = {'partner_ids': list(partner_ids), 'company_ids': list(company_ids), 'dates': [str(date) for date in dates]}
+        self.env.cr.execute(self._insert + self._select + """
+               AND (move.commercial_partner_id, move.company_id, date_trunc('month', move.invoice_date)::date)
+                   IN (SELECT * FROM unnest(%(partner_ids)s::int[], %(company_ids)s::int[], %(dates)s::date[]))
+          GROUP BY 1, 2, 3
+                ON CONFLICT (partner_id, company_id, date) DO UPDATE
+               SET apr_count = EXCLUDED.apr_count,
+                   invoiced_amount = EXCLUDED.invoiced_amount,
+                   paid_amount = EXCLUDED.paid_amount,
+                   residual_amount = EXCLUDED.residual_amount
+         RETURNING partner_id, company_id, date
+        """, params)
+        # no posted apr left for these keys
+        stale = keys - set(self.env.cr.fetchall())
+        if stale:
+            partner_ids, company_ids, dates = zip(*stale)
+            self.env.cr.execute("""
+                DELETE FROM ecodrip_apr_summary
+                 WHERE (partner_id, company_id, date) IN (SELECT * FROM unnest(%s::int[], %s::int[], %s::date[]))
+            """, [list(partner_ids), list(company_ids), [str(date) for date in dates]])
+        self.invalidate_cache()
+
+    @api.model
+    def _get_partner_totals(self, company_ids, partner_ids=None, date_from=None, date_to=None):
+        """ APR totals per customer for the reports: {partner id: {'invoiced': .., 'paid': .., 'residual': ..}} """
+        domain = [('company_id', 'in', company_ids)]
+        if partner_ids is not None:
+            domain.append(('partner_id', 'in', partner_ids))
+        if date_from:
+            domain.append(('date', '>=', date_from.replace(day=1)))
+        if date_to:
+            domain.append(('date', '<=', date_to))
+        return {
+            group['partner_id'][0]: {
+                'invoiced': group['invoiced_amount'],
+                'paid': group['paid_amount'],
+                'residual': group['residual_amount'],
+            }
+            for group in self.read_group(domain, ['invoiced_amount', 'paid_amount', 'residual_amount'], ['partner_id'])
+        }
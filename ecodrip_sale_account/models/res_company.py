@@ -7,4 +7,7 @@ class ResCompany(models.Model):
     x_apr_account_id = fields.Many2one('account.account', string='APR Account')
     x_apr_payment_term_id = fields.Many2one('account.payment.term', string='APR Payment Term')
     x_apr_product_id = fields.Many2one('product.product', string='APR Product')
-    
\ No newline at end of file
+
+    def _has_apr_settings(self):
+        self.ensure_one()
+        return bool(self.x_apr_payment_term_id and self.x_apr_product_id and (self.x_apr_account_id or self.x_apr_product_id.property_account_income_id))
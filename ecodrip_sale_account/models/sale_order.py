@@ -1,5 +1,6 @@
 from odoo import fields, models, api, _
 from odoo.exceptions import UserError, ValidationError
+from odoo.tools import groupby
 import datetime, dateutil
 
 
@@ -7,9 +8,68 @@ class SaleOrder(models.Model):
     _inherit = 'sale.order'
     
     def action_confirm(self):
-        for sol in self.order_line:
-            if (sol.product_id.standard_price > sol.price_unit) and self.env.ref('sales_team.group_sale_manager') not in self.env.user.groups_id:
-                raise UserError('Only manager can validate this SO since at least one product is being sold with a price that is lower than its cost.')
+        below_cost_lines = self._get_below_cost_lines()
+        if below_cost_lines:
+            raise UserError('Only manager can validate this SO since at least one product is being sold with a price that is lower than its cost.\n\n' + '\n'.join(
+                self._format_below_cost_lines(below_cost_lines)
+            ))
         result = super(SaleOrder, self).action_confirm()
         return result
-        
\ No newline at end of file
+
+    def action_confirm_bulk(self):
+        """ Confirm the orders passing the margin check and hold back the others, e.g. for imported orders.
+            Returns the lines sold below cost of the orders held back, see _get_below_cost_lines().
+        """
+        below_cost_lines = self._get_below_cost_lines()
+        held_orders = self.browse([line['order'].id for line in below_cost_lines])
+        if self - held_orders:
+            (self - held_orders).action_confirm()
+        return below_cost_lines
+
+    def action_confirm_selected(self):
+        """ Confirm the quotations selected in the list view, see action_confirm_bulk(), and notify which were held back. """
+        quotations = self.filtered(lambda order: order.state in ('draft', 'sent'))
+        below_cost_lines = quotations.action_confirm_bulk()
+        held_orders = self.browse([line['order'].id for line in below_cost_lines])
+        message = _('%s order(s) confirmed.') % len(quotations - held_orders)
+        if below_cost_lines:
+            message += ' ' + _('Held back, only a manager can confirm products sold below cost: %s') % '; '.join(
+                self._format_below_cost_lines(below_cost_lines)
+            )
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Order Confirmation'),
+                'message': message,
+                'type': 'warning' if below_cost_lines else 'success',
+                'sticky': bool(below_cost_lines),
+            },
+        }
+
+    @api.model
+    def _format_below_cost_lines(self, below_cost_lines):
+        return ['%s: %s (%s < %s)' % (line['order'].name, line['product'].display_name, line['price_unit'], line['cost']) for line in below_cost_lines]
+
+    def _get_below_cost_lines(self):
+        """ Lines of all the orders sold below the cost of their product, unless the user is a sales manager.
+            The costs are read per company in one go. Returns a list of dicts with order, line, product, price_unit and cost.
+        """
+        if self.env.user.has_group('sales_team.group_sale_manager'):
+            return []
+        below_cost_lines = []
+        lines = self.order_line.filtered(lambda sol: sol.product_id)
+        for company, company_lines in groupby(lines, key=lambda sol: sol.order_id.company_id):
+            company_lines = self.env['sale.order.line'].concat(*company_lines)
+            # standard_price is company dependent: read it for all the products of the company at once
+            costs = {product.id: product.standard_price for product in company_lines.product_id.with_company(company)}
+            for sol in company_lines:
+                if costs[sol.product_id.id] > sol.price_unit:
+                    below_cost_lines.append({
+                        'order': sol.order_id,
+                        'line': sol,
+                        'product': sol.product_id,
+                        'price_unit': sol.price_unit,
+                        'cost': costs[sol.product_id.id],
+                    })
+        return below_cost_lines
@@ -0,0 +1 @@
+from . import test_apr_generation, test_apr_projection, test_apr_run, test_apr_sequence, test_apr_summary, test_sale_order
@@ -0,0 +1,31 @@
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+
+class AprTestCommon(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.company = cls.company_data['company']
+        cls._set_apr_settings(cls.company_data)
+
+    @classmethod
+    def _set_apr_settings(cls, company_data):
+        company_data['company'].write({
+            'x_apr_product_id': cls.env.ref('ecodrip_sale_account.x_product_apr_ecodrip').id,
+            'x_apr_payment_term_id': cls.env.ref('ecodrip_sale_account.x_account_payment_term_apr_ecodrip').id,
+            'x_apr_account_id': company_data['default_account_revenue'].id,
+        })
+
+    @classmethod
+    def _create_invoice(cls, invoice_date, amount=1000.0, partner=None):
+        # due on its date: overdue from the next day on
+        invoice = cls.env['account.move'].create({
+            'move_type': 'out_invoice',
+            'partner_id': (partner or cls.partner_a).id,
+            'invoice_date': invoice_date,
+            'invoice_payment_term_id': False,
+            'invoice_line_ids': [(0, 0, {'name': 'Irrigation supplies', 'quantity': 1, 'price_unit': amount, 'tax_ids': []})],
+        })
+        invoice.action_post()
+        return invoice
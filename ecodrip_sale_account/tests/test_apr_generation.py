@@ -0,0 +1,138 @@
+import re
+
+from dateutil.relativedelta import relativedelta
+from psycopg2 import IntegrityError
+
+from odoo import fields
+from odoo.tests import tagged
+from odoo.tools import mute_logger
+
+from odoo.addons.ecodrip_sale_account.models.account_move import APR_ADVISORY_LOCK_KEY
+from .common import AprTestCommon
+
+
+def generate_apr_legacy(invoice, date):
+    """ The loop generate_apr ran before the batched engine, one create/post per apr. Returns the created aprs. """
+    Move = invoice.env['account.move']
+    aprs = Move
+    last_apr_id = invoice.last_apr_id or invoice
+    while last_apr_id.invoice_date_due < date:
+        first_day = last_apr_id.invoice_date_due if last_apr_id == invoice else last_apr_id.invoice_date
+        last_sequence = invoice._get_last_sequence()
+        last_sequence_number = re.match('.*?([0-9]+)$', last_sequence).group(1)
+        new_sequence_number = int(last_sequence_number) + 1
+        if Move.search([('sequence_prefix', 'like', invoice.sequence_prefix), ('sequence_number', '=', new_sequence_number)]):
+            new_sequence_number += 1
+        new_sequence = last_sequence[::-1].replace(last_sequence_number[::-1], '', 1)[::-1] + '{:04d}'.format(new_sequence_number)
+        company = invoice.company_id
+        new_apr_id = Move.create({
+            'name': '{}-{}/APR/{:03d}'.format(new_sequence, invoice.name, len(invoice.x_apr_ids) + 1),
+            'company_id': company.id,
+            'partner_id': invoice.partner_id.id,
+            'move_type': 'out_invoice',
+            'x_invoice_id': invoice.id,
+            'invoice_payment_term_id': company.x_apr_payment_term_id.id,
+            'invoice_date': invoice.last_day_of_month(last_apr_id.invoice_date_due),
+            'invoice_line_ids': [(0, 0, {
+                'product_id': company.x_apr_product_id.id,
+                'price_unit': invoice.amount_residual * ((invoice.last_day_of_month(last_apr_id.invoice_date_due) - first_day).days / 365.0 * 0.18),
+                'quantity': 1.00,
+                'name': company.x_apr_product_id.description_sale or 'Finance Charges',
+                'account_id': company.x_apr_product_id.property_account_income_id.id or company.x_apr_account_id.id,
+            })],
+        })
+        new_apr_id.action_post()
+        aprs |= new_apr_id
+        last_apr_id = new_apr_id
+    return aprs
+
+
+@tagged('post_install', '-at_install')
+class TestAprGeneration(AprTestCommon):
+
+    def _describe(self, aprs):
+        # the number in front of the name comes from the block allocator, see test_apr_sequence
+        return [(
+            apr.name.split('-', 1)[1],
+            apr.invoice_date,
+            apr.invoice_date_due,
+            round(apr.invoice_line_ids.price_unit, 6),
+            apr.amount_total,
+            apr.x_invoice_id,
+            apr.state,
+        ) for apr in aprs.sorted('invoice_date')]
+
+    def _assert_same_as_legacy(self, invoice, date):
+        self.env['base'].flush()
+        self.env.cr.execute('SAVEPOINT legacy_apr')
+        expected = self._describe(generate_apr_legacy(invoice, date))
+        self.env['base'].flush()
+        self.env.cr.execute('ROLLBACK TO SAVEPOINT legacy_apr')
+        self.env.clear()
+
+        aprs = invoice.generate_apr(date=date)
+        self.assertTrue(expected)
+        self.assertEqual(self._describe(aprs), expected)
+        self.assertEqual(invoice.last_apr_id, aprs.sorted('invoice_date_due')[-1])
+        return aprs
+
+    def test_invoice_several_months_overdue(self):
+        today = fields.Date.context_today(self.env.user)
+        invoice = self._create_invoice(today - relativedelta(months=5, days=12), amount=1532.27)
+        aprs = self._assert_same_as_legacy(invoice, today)
+        self.assertGreaterEqual(len(aprs), 5)
+
+    def test_invoice_with_aprs(self):
+        today = fields.Date.context_today(self.env.user)
+        invoice = self._create_invoice(today - relativedelta(months=9), amount=67.27)
+        first_aprs = invoice.generate_apr(date=today - relativedelta(months=4))
+        self.assertTrue(first_aprs)
+        self._assert_same_as_legacy(invoice, today)
+        self.assertEqual(invoice.x_apr_count, len(invoice.x_apr_ids))
+
+    def test_several_invoices_at_once(self):
+        today = fields.Date.context_today(self.env.user)
+        invoices = self._create_invoice(today - relativedelta(months=3), amount=400.0) \
+            + self._create_invoice(today - relativedelta(months=7), amount=900.0, partner=self.partner_b)
+        expected = {}
+        self.env['base'].flush()
+        self.env.cr.execute('SAVEPOINT legacy_apr')
+        for invoice in invoices:
+            expected[invoice.id] = self._describe(generate_apr_legacy(invoice, today))
+        self.env['base'].flush()
+        self.env.cr.execute('ROLLBACK TO SAVEPOINT legacy_apr')
+        self.env.clear()
+
+        aprs = invoices.generate_apr(date=today)
+        for invoice in invoices:
+            self.assertEqual(self._describe(aprs.filtered(lambda apr: apr.x_invoice_id == invoice)), expected[invoice.id])
+
+    def test_generate_twice(self):
+        today = fields.Date.context_today(self.env.user)
+        invoice = self._create_invoice(today - relativedelta(months=3))
+        aprs = invoice.generate_apr(date=today)
+        self.assertTrue(aprs)
+        # a second run of the same month, e.g. a replayed chunk
+        self.assertFalse(invoice.generate_apr(date=today, safe=True))
+        self.assertEqual(invoice.x_apr_ids, aprs)
+
+    def test_invoice_locked_by_another_run(self):
+        today = fields.Date.context_today(self.env.user)
+        invoice = self._create_invoice(today - relativedelta(months=3))
+        with self.registry.cursor() as cr:
+            cr.execute("SELECT pg_advisory_xact_lock(%s, %s)", [APR_ADVISORY_LOCK_KEY, invoice.id])
+            self.assertFalse(invoice.generate_apr(date=today))
+        self.assertFalse(invoice.x_apr_ids)
+        # released with the transaction of the other run
+        self.assertTrue(invoice.generate_apr(date=today))
+
+    def test_one_apr_per_invoice_and_month(self):
+        today = fields.Date.context_today(self.env.user)
+        invoice = self._create_invoice(today - relativedelta(months=1))
+        apr = invoice.generate_apr(date=today)[0]
+        with self.assertRaises(IntegrityError), mute_logger('odoo.sql_db'), self.env.cr.savepoint():
+            apr.copy({'x_apr_key': apr.x_apr_key, 'invoice_date': apr.invoice_date}).flush()
+        # a cancelled apr does not hold its month
+        apr.button_draft()
+        apr.button_cancel()
+        apr.copy({'x_apr_key': apr.x_apr_key, 'invoice_date': apr.invoice_date}).flush()
@@ -0,0 +1,53 @@
+from dateutil.relativedelta import relativedelta
+
+from odoo import fields
+from odoo.tests import tagged
+
+from odoo.addons.ecodrip_sale_account.models.apr_projection import np
+from .common import AprTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestAprProjection(AprTestCommon):
+
+    def setUp(self):
+        super().setUp()
+        if np is None:
+            self.skipTest('numpy is not installed')
+
+    def test_projection_matches_generator(self):
+        today = fields.Date.context_today(self.env.user)
+        invoices = self._create_invoice(today - relativedelta(months=5, days=3), amount=1532.27) \
+            + self._create_invoice(today - relativedelta(days=40), amount=67.27) \
+            + self._create_invoice(today + relativedelta(days=10), amount=250.0)
+        # an invoice whose first aprs already exist
+        with_aprs = self._create_invoice(today - relativedelta(months=8), amount=980.0)
+        with_aprs.generate_apr(date=today - relativedelta(months=4))
+        self.assertTrue(with_aprs.x_apr_ids)
+        invoices |= with_aprs
+
+        horizon = today + relativedelta(months=6)
+        projection = self.env['ecodrip.apr.projection'].create({'months': '6', 'date': today, 'company_ids': [(6, 0, self.company.ids)]})
+        invoice_ids, partner_ids, company_ids, periods, amounts = projection._project(horizon)
+        projected = sorted(
+            (invoice_id, str(period), amount)
+            for invoice_id, period, amount in zip(invoice_ids.tolist(), periods.tolist(), amounts.tolist())
+            if invoice_id in invoices.ids
+        )
+        expected = sorted(
+            (inv.id, str(vals['invoice_date']), vals['invoice_line_ids'][0][2]['price_unit'])
+            for inv, vals in invoices._prepare_apr_schedule(horizon)
+        )
+        self.assertEqual([row[:2] for row in projected], [row[:2] for row in expected])
+        for (invoice_id, period, amount), (_id, _period, expected_amount) in zip(projected, expected):
+            self.assertAlmostEqual(amount, expected_amount, places=6, msg='invoice %s, %s' % (invoice_id, period))
+
+    def test_projection_without_open_invoices(self):
+        self._set_apr_settings(self.company_data_2)
+        projection = self.env['ecodrip.apr.projection'].create({
+            'months': '12',
+            'date': fields.Date.context_today(self.env.user),
+            'company_ids': [(6, 0, self.company_data_2['company'].ids)],
+        })
+        projection.action_compute()
+        self.assertFalse(projection.line_ids)
@@ -0,0 +1,35 @@
+from freezegun import freeze_time
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import AprTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestAprRun(AprTestCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.Run = self.env['ecodrip.apr.run']
+        self.env['ir.config_parameter'].sudo().set_param('ecodrip_sale_account.apr_run_day', 0)
+        # the runs of the database are not the concern of these tests
+        self.Run.search([]).write({'state': 'done'})
+
+    def _get_scheduled_runs(self):
+        return self.Run.search([('origin', '=', 'cron')])
+
+    @freeze_time('2021-03-05')
+    def test_manual_run_keeps_scheduled_run(self):
+        manual = self.Run.create({})
+        self.assertEqual(manual.origin, 'manual')
+        self.Run._cron_run_apr()
+        self.assertEqual(manual.state, 'done', 'the cron resumes the running run')
+        self.assertFalse(self._get_scheduled_runs(), 'the scheduled run waits for the last day of the month')
+
+        with freeze_time('2021-03-31'):
+            self.Run._cron_run_apr()
+            scheduled = self._get_scheduled_runs()
+            self.assertRecordValues(scheduled, [{'date': fields.Date.to_date('2021-03-31'), 'state': 'done'}])
+            self.Run._cron_run_apr()
+            self.assertEqual(self._get_scheduled_runs(), scheduled, 'the scheduled run starts once a month')
@@ -0,0 +1,54 @@
+from dateutil.relativedelta import relativedelta
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import AprTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestAprSequence(AprTestCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.invoice = self._create_invoice(fields.Date.context_today(self.env.user))
+        self.journal = self.invoice.journal_id
+        self.prefix = self.invoice.sequence_prefix
+        self.Sequence = self.env['ecodrip.apr.sequence']
+
+    def test_consecutive_reservations(self):
+        first = self.Sequence._reserve(self.journal, self.prefix, 3)
+        self.assertEqual(first, self.invoice.sequence_number + 1)
+        second = self.Sequence._reserve(self.journal, self.prefix, 2)
+        self.assertEqual(second, first + 3)
+
+    def test_regular_invoice_in_between(self):
+        first = self.Sequence._reserve(self.journal, self.prefix, 2)
+        # numbered past the reserved block before the next reservation
+        regular = self.invoice.copy({
+            'invoice_date': self.invoice.invoice_date,
+            'name': '{}{:04d}'.format(self.prefix, first + 10),
+        })
+        regular.action_post()
+        self.assertEqual(regular.sequence_number, first + 10)
+        second = self.Sequence._reserve(self.journal, self.prefix, 2)
+        self.assertEqual(second, first + 11)
+
+    def test_rollback_hands_block_back(self):
+        first = self.Sequence._reserve(self.journal, self.prefix, 2)
+        try:
+            with self.env.cr.savepoint():
+                rolled_back = self.Sequence._reserve(self.journal, self.prefix, 4)
+                raise RuntimeError('rollback')
+        except RuntimeError:
+            pass
+        self.assertEqual(rolled_back, first + 2)
+        self.assertEqual(self.Sequence._reserve(self.journal, self.prefix, 4), rolled_back)
+
+    def test_apr_names_are_unique(self):
+        today = fields.Date.context_today(self.env.user)
+        invoice = self._create_invoice(today - relativedelta(months=6))
+        aprs = invoice.generate_apr(date=today)
+        self.assertGreater(len(aprs), 1)
+        numbers = [apr.name.split('-', 1)[0] for apr in aprs]
+        self.assertEqual(len(numbers), len(set(numbers)))
@@ -0,0 +1,43 @@
+from dateutil.relativedelta import relativedelta
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import AprTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestAprSummary(AprTestCommon):
+
+    def _get_summary(self, apr):
+        return self.env['ecodrip.apr.summary'].search([
+            ('partner_id', '=', apr.commercial_partner_id.id),
+            ('company_id', '=', apr.company_id.id),
+            ('date', '=', apr.invoice_date.replace(day=1)),
+        ])
+
+    def test_refresh_same_key_twice(self):
+        today = fields.Date.context_today(self.env.user)
+        invoice_date = today - relativedelta(months=2)
+        first = self._create_invoice(invoice_date).generate_apr(date=today).sorted('invoice_date')[0]
+        summary = self._get_summary(first)
+        self.assertRecordValues(summary, [{'apr_count': 1, 'invoiced_amount': first.amount_total_signed}])
+
+        # aprs of another invoice of the customer, for the same months
+        second = self._create_invoice(invoice_date, amount=500.0).generate_apr(date=today).sorted('invoice_date')[0]
+        self.assertEqual(second.invoice_date, first.invoice_date)
+        self.assertEqual(self._get_summary(second), summary, 'the row of the month is updated in place')
+        self.assertRecordValues(summary, [{
+            'apr_count': 2,
+            'invoiced_amount': first.amount_total_signed + second.amount_total_signed,
+            'residual_amount': first.amount_residual_signed + second.amount_residual_signed,
+        }])
+
+        self.env['ecodrip.apr.summary']._refresh(first | second)
+        self.assertEqual(self._get_summary(first), summary)
+        self.assertEqual(summary.apr_count, 2)
+
+        second.button_draft()
+        self.assertRecordValues(summary, [{'apr_count': 1, 'invoiced_amount': first.amount_total_signed}])
+        first.button_draft()
+        self.assertFalse(self._get_summary(first), 'no posted apr left for the month')
@@ -0,0 +1,41 @@
+from odoo.addons.sale.tests.common import TestSaleCommon
+from odoo.tests import tagged
+
+
+@tagged('post_install', '-at_install')
+class TestSaleOrderMargin(TestSaleCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.salesman = cls.company_data['default_user_salesman']
+        cls.product = cls.env['product.product'].create({
+            'name': 'Drip Kit Installation',
+            'type': 'service',
+            'list_price': 1000.0,
+            'standard_price': 800.0,
+        })
+
+    def _create_order(self, price_unit):
+        return self.env['sale.order'].create({
+            'partner_id': self.partner_a.id,
+            'user_id': self.salesman.id,
+            'order_line': [(0, 0, {'product_id': self.product.id, 'product_uom_qty': 1.0, 'price_unit': price_unit})],
+        })
+
+    def test_confirm_selected(self):
+        passing = self._create_order(1000.0)
+        failing = self._create_order(500.0)
+        action = (passing | failing).with_user(self.salesman).action_confirm_selected()
+
+        self.assertEqual(passing.state, 'sale')
+        self.assertEqual(failing.state, 'draft')
+        self.assertEqual(action['params']['type'], 'warning')
+        self.assertIn(failing.name, action['params']['message'])
+        self.assertNotIn(passing.name, action['params']['message'])
+
+    def test_confirm_selected_all_passing(self):
+        orders = self._create_order(1000.0) | self._create_order(900.0)
+        action = orders.with_user(self.salesman).action_confirm_selected()
+        self.assertEqual(set(orders.mapped('state')), {'sale'})
+        self.assertEqual(action['params']['type'], 'success')